@@ -3,6 +3,7 @@ Celery configuration for agentvideo project
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -20,6 +21,13 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Create fresh Gemini/Veo clients in each worker child process (never share them across fork)"""
+    from app.services import init_api_clients
+    init_api_clients()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
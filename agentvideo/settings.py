@@ -166,10 +166,25 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Upload Configuration
+# Maximum size of uploaded CSV/Excel files in bytes (0 = unlimited)
+DATA_FILE_MAX_UPLOAD_SIZE = int(os.getenv('DATA_FILE_MAX_UPLOAD_SIZE', 500 * 1024 * 1024))
+
 # API Keys (loaded from environment variables)
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 VEO_API_KEY = os.getenv('VEO_API_KEY')
 GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+# Gemini prompt suggestion cache (Redis)
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv('GEMINI_CACHE_TTL_SECONDS', 24 * 3600))
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 1000))
+# Per-row prompt enrichment with Gemini, done per generation chunk right before submitting to Veo
+GEMINI_ROW_ENRICHMENT_ENABLED = os.getenv('GEMINI_ROW_ENRICHMENT_ENABLED', 'False').lower() == 'true'
+# Rows packed into one Gemini request
+GEMINI_ENRICHMENT_BATCH_SIZE = int(os.getenv('GEMINI_ENRICHMENT_BATCH_SIZE', 20))
+# Concurrent Gemini requests per generation chunk
+GEMINI_ENRICHMENT_CONCURRENCY = int(os.getenv('GEMINI_ENRICHMENT_CONCURRENCY', 4))
+# Maximum cached enriched row prompts
+GEMINI_ROW_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_ROW_CACHE_MAX_ENTRIES', 50000))
 
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
@@ -183,6 +198,89 @@ CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutes
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
+# Veo operation polling (celery beat)
+# How often the beat sweep looks for operations due for a refresh (next_poll_at)
+VEO_POLL_INTERVAL_SECONDS = int(os.getenv('VEO_POLL_INTERVAL_SECONDS', 5))
+# First refresh of an operation when no duration statistics exist yet
+VEO_POLL_DEFAULT_FIRST_DELAY_SECONDS = int(os.getenv('VEO_POLL_DEFAULT_FIRST_DELAY_SECONDS', 60))
+# First refresh at this fraction of the observed median generation time
+VEO_POLL_FIRST_POLL_FRACTION = float(os.getenv('VEO_POLL_FIRST_POLL_FRACTION', 0.9))
+# Exponential backoff between later refreshes
+VEO_POLL_MIN_INTERVAL_SECONDS = int(os.getenv('VEO_POLL_MIN_INTERVAL_SECONDS', 5))
+VEO_POLL_MAX_INTERVAL_SECONDS = int(os.getenv('VEO_POLL_MAX_INTERVAL_SECONDS', 60))
+# Random +/- fraction applied to every poll delay
+VEO_POLL_JITTER = float(os.getenv('VEO_POLL_JITTER', 0.2))
+# Generation times kept per model/resolution, and needed before the median is used
+VEO_DURATION_SAMPLE_SIZE = int(os.getenv('VEO_DURATION_SAMPLE_SIZE', 200))
+VEO_DURATION_MIN_SAMPLES = int(os.getenv('VEO_DURATION_MIN_SAMPLES', 5))
+# Maximum operations refreshed per sweep
+VEO_POLL_BATCH_SIZE = int(os.getenv('VEO_POLL_BATCH_SIZE', 200))
+# Concurrent operation refreshes within a sweep
+VEO_POLL_CONCURRENCY = int(os.getenv('VEO_POLL_CONCURRENCY', 8))
+# Minimum interval between status refreshes of one video from /api/veo/status/
+VEO_STATUS_MIN_REFRESH_SECONDS = int(os.getenv('VEO_STATUS_MIN_REFRESH_SECONDS', 10))
+# Optional Veo endpoint override, e.g. a local fake Veo server for testing
+VEO_API_BASE_URL = os.getenv('VEO_API_BASE_URL')
+
+# Stale video reaper (celery beat)
+STALE_VIDEO_SWEEP_INTERVAL_SECONDS = int(os.getenv('STALE_VIDEO_SWEEP_INTERVAL_SECONDS', 300))
+# Processing rows never submitted to Veo are re-queued after this many seconds
+STALE_VIDEO_SUBMIT_SECONDS = int(os.getenv('STALE_VIDEO_SUBMIT_SECONDS', 600))
+# Processing rows whose Veo operation has not finished after this many seconds are marked failed
+STALE_VIDEO_OPERATION_SECONDS = int(os.getenv('STALE_VIDEO_OPERATION_SECONDS', 3600))
+# Maximum rows examined per sweep
+STALE_VIDEO_SWEEP_LIMIT = int(os.getenv('STALE_VIDEO_SWEEP_LIMIT', 500))
+
+CELERY_BEAT_SCHEDULE = {
+    'poll-veo-operations': {
+        'task': 'app.tasks.poll_veo_operations',
+        'schedule': VEO_POLL_INTERVAL_SECONDS,
+    },
+    'download-completed-videos': {
+        'task': 'app.tasks.download_completed_videos',
+        'schedule': int(os.getenv('VIDEO_DOWNLOAD_SWEEP_INTERVAL_SECONDS', 60)),
+    },
+    'reap-stale-videos': {
+        'task': 'app.tasks.reap_stale_videos',
+        'schedule': STALE_VIDEO_SWEEP_INTERVAL_SECONDS,
+    },
+    'reconcile-project-progress': {
+        'task': 'app.tasks.reconcile_project_progress',
+        'schedule': int(os.getenv('PROGRESS_RECONCILE_INTERVAL_SECONDS', 600)),
+    },
+}
+
+# Bounds of the retry_after hint returned to polling clients by /api/projects/<id>/statuses
+STATUS_CLIENT_MIN_RETRY_SECONDS = int(os.getenv('STATUS_CLIENT_MIN_RETRY_SECONDS', 2))
+STATUS_CLIENT_MAX_RETRY_SECONDS = int(os.getenv('STATUS_CLIENT_MAX_RETRY_SECONDS', 30))
+
+# Interval between aggregate count events on the project SSE stream
+PROJECT_EVENTS_COUNTS_INTERVAL_SECONDS = int(os.getenv('PROJECT_EVENTS_COUNTS_INTERVAL_SECONDS', 10))
+
+# Video generation fan-out
+# Number of rows turned into VideoGeneration documents per insert_many
+VIDEO_GENERATION_BATCH_SIZE = int(os.getenv('VIDEO_GENERATION_BATCH_SIZE', 500))
+# Number of rows handled by one generate_video_chunk task (one broker message)
+VIDEO_GENERATION_CHUNK_SIZE = int(os.getenv('VIDEO_GENERATION_CHUNK_SIZE', 50))
+
+# Local copies of generated videos (MEDIA_ROOT/videos/)
+# Concurrent downloads per task (also the HTTP connection pool size)
+VIDEO_DOWNLOAD_CONCURRENCY = int(os.getenv('VIDEO_DOWNLOAD_CONCURRENCY', 4))
+# Bytes read per chunk while streaming a download
+VIDEO_DOWNLOAD_CHUNK_SIZE = int(os.getenv('VIDEO_DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+# Seconds without data before a download is interrupted (resumed later)
+VIDEO_DOWNLOAD_READ_TIMEOUT = int(os.getenv('VIDEO_DOWNLOAD_READ_TIMEOUT', 60))
+# Maximum videos picked up by one download sweep
+VIDEO_DOWNLOAD_BATCH_SIZE = int(os.getenv('VIDEO_DOWNLOAD_BATCH_SIZE', 100))
+# Failed downloads are retried with exponential backoff and given up after VIDEO_DOWNLOAD_MAX_ATTEMPTS
+VIDEO_DOWNLOAD_MAX_ATTEMPTS = int(os.getenv('VIDEO_DOWNLOAD_MAX_ATTEMPTS', 6))
+VIDEO_DOWNLOAD_RETRY_BASE_SECONDS = int(os.getenv('VIDEO_DOWNLOAD_RETRY_BASE_SECONDS', 60))
+VIDEO_DOWNLOAD_RETRY_MAX_SECONDS = int(os.getenv('VIDEO_DOWNLOAD_RETRY_MAX_SECONDS', 3600))
+# Serve local videos through the front proxy: '' (Django streams the file), 'x-sendfile' or 'x-accel-redirect'
+VIDEO_SENDFILE_BACKEND = os.getenv('VIDEO_SENDFILE_BACKEND', '').lower()
+# Internal nginx location mapped to MEDIA_ROOT, used with 'x-accel-redirect'
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv('VIDEO_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 # Redis Configuration (for caching)
 # When running in Docker, REDIS_HOST will be 'redis' (service name)
 # When running locally, REDIS_HOST will be 'localhost'
@@ -191,6 +289,29 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_DB = int(os.getenv('REDIS_DB', 0))
 REDIS_URL = os.getenv('REDIS_URL') or f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
 
+# Veo rate limiting (shared by all workers through Redis)
+# Requests per minute allowed for Veo submissions (0 = unlimited)
+VEO_RATE_LIMIT_RPM = float(os.getenv('VEO_RATE_LIMIT_RPM', 10))
+# Token bucket capacity (defaults to VEO_RATE_LIMIT_RPM)
+VEO_RATE_LIMIT_BURST = float(os.getenv('VEO_RATE_LIMIT_BURST', 0))
+# Maximum Veo operations in flight at once (0 = unlimited)
+VEO_MAX_IN_FLIGHT = int(os.getenv('VEO_MAX_IN_FLIGHT', 20))
+# In-flight slots expire after this many seconds if never released
+VEO_IN_FLIGHT_LEASE_SECONDS = int(os.getenv('VEO_IN_FLIGHT_LEASE_SECONDS', 1800))
+# Upper bound for the reschedule delay of throttled tasks
+VEO_RATE_LIMIT_MAX_WAIT_SECONDS = int(os.getenv('VEO_RATE_LIMIT_MAX_WAIT_SECONDS', 60))
+# A claimed video may be taken over by another worker if not submitted to Veo within this time
+VEO_SUBMIT_LEASE_SECONDS = int(os.getenv('VEO_SUBMIT_LEASE_SECONDS', 300))
+# Retries of failed Veo submissions per error class: exponential backoff with jitter from
+# *_BASE_SECONDS up to *_MAX_SECONDS (server retry hints win when longer).
+# Invalid prompt and auth errors are never retried.
+VEO_RETRY_RATE_LIMIT_BASE_SECONDS = int(os.getenv('VEO_RETRY_RATE_LIMIT_BASE_SECONDS', 30))
+VEO_RETRY_RATE_LIMIT_MAX_SECONDS = int(os.getenv('VEO_RETRY_RATE_LIMIT_MAX_SECONDS', 900))
+VEO_RETRY_RATE_LIMIT_MAX_RETRIES = int(os.getenv('VEO_RETRY_RATE_LIMIT_MAX_RETRIES', 6))
+VEO_RETRY_TRANSIENT_BASE_SECONDS = int(os.getenv('VEO_RETRY_TRANSIENT_BASE_SECONDS', 10))
+VEO_RETRY_TRANSIENT_MAX_SECONDS = int(os.getenv('VEO_RETRY_TRANSIENT_MAX_SECONDS', 300))
+VEO_RETRY_TRANSIENT_MAX_RETRIES = int(os.getenv('VEO_RETRY_TRANSIENT_MAX_RETRIES', 4))
+
 # Cache Configuration
 CACHES = {
     'default': {
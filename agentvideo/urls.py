@@ -26,12 +26,17 @@ urlpatterns = [
     path("step1/", views.step1_upload, name="step1_upload"),
     path("step2/<str:project_id>/", views.step2_prompt, name="step2_prompt"),
     path("step3/<str:project_id>/", views.step3_videos, name="step3_videos"),
+    path("videos/<str:video_id>/", views.serve_video, name="serve_video"),
     
     # API endpoints
     path("api/gemini/suggest-prompt/", views.api_gemini_suggest_prompt, name="api_gemini_suggest_prompt"),
+    path("api/gemini/suggest-prompt/stream/", views.api_gemini_suggest_prompt_stream, name="api_gemini_suggest_prompt_stream"),
     path("api/prompt/save/<str:project_id>/", views.save_prompt_template, name="save_prompt_template"),
     path("api/veo/start/<str:project_id>/", views.api_start_video_generation, name="api_start_video_generation"),
     path("api/veo/status/<str:video_id>/", views.api_veo_status, name="api_veo_status"),
+    path("api/projects/<str:project_id>/statuses", views.api_project_statuses, name="api_project_statuses"),
+    path("api/projects/<str:project_id>/events", views.api_project_events, name="api_project_events"),
+    path("api/projects/<str:project_id>/progress", views.api_project_progress, name="api_project_progress"),
 ]
 
 # Serve media files in development
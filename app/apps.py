@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app"
+
+    def ready(self):
+        # Create long-lived Gemini/Veo clients once per process
+        from .services import init_api_clients
+        init_api_clients()
@@ -0,0 +1,79 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from app.mongodb_models import VideoGeneration, PromptAsset
+from app.services import progress_service
+
+logger = logging.getLogger(__name__)
+
+# Row giữ lại trong mỗi nhóm trùng: status tốt nhất, sau đó row tạo sớm nhất
+STATUS_PRIORITY = {'completed': 0, 'processing': 1, 'pending': 2, 'failed': 3}
+
+
+class Command(BaseCommand):
+    help = (
+        "Xóa VideoGeneration trùng (project, row_index) và tạo unique index "
+        "mà batch_generate_videos cần"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ in số rows trùng, không xóa'
+        )
+
+    def handle(self, *args, **options):
+        collection = VideoGeneration._get_collection()
+        groups = collection.aggregate([
+            {'$group': {
+                '_id': {'project': '$project', 'row_index': '$row_index'},
+                'rows': {'$push': {'_id': '$_id', 'status': '$status', 'created_at': '$created_at'}},
+                'count': {'$sum': 1},
+            }},
+            {'$match': {'count': {'$gt': 1}}},
+        ], allowDiskUse=True)
+
+        removed = 0
+        projects = set()
+        for group in groups:
+            rows = sorted(
+                group['rows'],
+                key=lambda row: (
+                    STATUS_PRIORITY.get(row.get('status'), len(STATUS_PRIORITY)),
+                    row.get('created_at') is None,
+                    row.get('created_at') or 0,
+                )
+            )
+            keep_id = rows[0]['_id']
+            duplicate_ids = [row['_id'] for row in rows[1:]]
+            removed += len(duplicate_ids)
+            projects.add(group['_id']['project'])
+
+            if options['dry_run']:
+                continue
+
+            # Rows / prompt assets linked to a removed row follow the row that is kept
+            collection.update_many({'duplicate_of': {'$in': duplicate_ids}}, {'$set': {'duplicate_of': keep_id}})
+            PromptAsset._get_collection().update_many(
+                {'leader': {'$in': duplicate_ids}}, {'$set': {'leader': keep_id}}
+            )
+            collection.delete_many({'_id': {'$in': duplicate_ids}})
+
+        if options['dry_run']:
+            self.stdout.write(f"{removed} duplicate rows in {len(projects)} projects (dry run, nothing deleted)")
+            return
+
+        for project_id in projects:
+            try:
+                progress_service.reconcile_progress(str(project_id))
+            except Exception as e:
+                logger.warning(f"Could not reconcile progress counters for project {project_id}: {str(e)}")
+
+        self.stdout.write(f"Removed {removed} duplicate rows in {len(projects)} projects")
+
+        if VideoGeneration.ensure_unique_row_index():
+            self.stdout.write(self.style.SUCCESS("Unique (project, row_index) index is in place"))
+        else:
+            self.stderr.write("Could not create the unique (project, row_index) index, see the log")
@@ -3,10 +3,14 @@ MongoDB models using mongoengine
 These models store the main application data in MongoDB
 """
 from mongoengine import Document, EmbeddedDocument, fields, connect
+from pymongo.errors import OperationFailure
 from datetime import datetime
 import os
+import logging
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 # Ensure connection is established
 try:
     MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')
@@ -34,6 +38,8 @@ class Project(Document):
         choices=['uploading', 'editing_prompt', 'generating', 'completed'],
         default='uploading'
     )
+    generation_checkpoint = fields.IntField(default=-1)  # Last row_index persisted by batch_generate_videos
+    generation_queueing = fields.BooleanField(default=False)  # batch_generate_videos is still queueing rows
     
     meta = {
         'collection': 'projects',
@@ -55,6 +61,9 @@ class DataFile(Document):
     file_type = fields.StringField(max_length=10, choices=['csv', 'xlsx'])
     columns = fields.ListField(fields.StringField(), default=list)
     total_rows = fields.IntField(default=0)
+    file_size = fields.IntField(default=0)  # Bytes
+    file_hash = fields.StringField(max_length=64, default=None)  # SHA-256 of file content
+    snapshot_path = fields.StringField(default=None)  # Columnar .npy snapshot directory
     uploaded_at = fields.DateTimeField(default=datetime.utcnow)
     
     meta = {
@@ -94,28 +103,124 @@ class VideoGeneration(Document):
     row_index = fields.IntField(required=True)
     row_data = fields.DictField(required=True)
     prompt_used = fields.StringField(required=True)
+    prompt_enriched = fields.BooleanField(default=False)  # prompt_used already went through Gemini enrichment
     video_url = fields.URLField(default=None)
-    video_file_path = fields.StringField(default=None)
+    video_file_path = fields.StringField(default=None)  # Local copy (relative to MEDIA_ROOT)
+    video_file_size = fields.IntField(default=None)  # Bytes
+    video_checksum = fields.StringField(max_length=32, default=None)  # MD5 of local copy
+    download_attempts = fields.IntField(default=0)  # Failed downloads of the local copy so far
+    download_error = fields.StringField(default=None)  # Last download error
+    next_download_at = fields.DateTimeField(default=None)  # Download retry is due (backoff)
     status = fields.StringField(
         max_length=20,
         choices=['pending', 'processing', 'completed', 'failed'],
         default='pending'
     )
     veo_job_id = fields.StringField(max_length=200, default=None)
+    lease_owner = fields.StringField(max_length=200, default=None)  # Worker that claimed the row
+    lease_expires_at = fields.DateTimeField(default=None)  # Claim expiry until Veo accepted the job
+    submit_attempts = fields.IntField(default=0)  # Retryable Veo submission failures so far
+    next_attempt_at = fields.DateTimeField(default=None)  # A retry / throttled message is queued for this time
+    prompt_hash = fields.StringField(max_length=64, default=None)  # See PromptAsset
+    duplicate_of = fields.ObjectIdField(default=None)  # VideoGeneration generating the shared asset
     error_message = fields.StringField(default=None)
+    submitted_at = fields.DateTimeField(default=None)  # Veo operation accepted
+    poll_count = fields.IntField(default=0)  # Veo operation refreshes so far
+    next_poll_at = fields.DateTimeField(default=None)  # Next Veo operation refresh is due
+    last_polled_at = fields.DateTimeField(default=None)  # Last Veo operation refresh
     created_at = fields.DateTimeField(default=datetime.utcnow)
     updated_at = fields.DateTimeField(default=datetime.utcnow)
     
     meta = {
         'collection': 'video_generations',
-        'indexes': ['project', 'row_index', 'status', 'created_at'],
+        'indexes': [
+            'project', 'row_index', 'status', 'created_at',
+            # Unique (project, row_index) is created by ensure_unique_row_index()
+            ('status', 'next_poll_at'),
+            ('project', 'status', 'next_poll_at'),
+            ('project', 'status', 'next_attempt_at'),
+            ('status', 'updated_at'),
+            ('project', 'updated_at'),
+            ('status', 'video_file_path', 'next_download_at'),
+            'duplicate_of',
+        ],
         'ordering': ['row_index']
     }
     
+    ROW_INDEX_NAME = 'project_1_row_index_1'
+    _row_index_ready = False
+    
     def __str__(self):
         return f"Video {self.row_index} - {self.project.name}"
     
+    @classmethod
+    def ensure_unique_row_index(cls) -> bool:
+        """
+        Tạo unique index (project, row_index) nếu chưa có
+        
+        Index không nằm trong meta['indexes']: database cũ có rows trùng (project, row_index)
+        làm index build lỗi, và mongoengine sẽ raise ở mọi query. Chạy
+        `python manage.py dedupe_video_generations` để xóa rows trùng và tạo index.
+        
+        Returns:
+            True nếu index đã tồn tại / được tạo
+        """
+        if cls._row_index_ready:
+            return True
+        try:
+            cls._get_collection().create_index(
+                [('project', 1), ('row_index', 1)], unique=True, name=cls.ROW_INDEX_NAME
+            )
+        except OperationFailure as e:
+            logger.warning(
+                f"Unique (project, row_index) index not created, run `manage.py dedupe_video_generations`: {str(e)}"
+            )
+            return False
+        cls._row_index_ready = True
+        return True
+    
     def save(self, *args, **kwargs):
         self.updated_at = datetime.utcnow()
         return super().save(*args, **kwargs)
 
+
+
+
+class PromptAsset(Document):
+    """
+    Video đã generate cho một normalized prompt + generation parameters
+
+    VideoGeneration đầu tiên claim prompt_hash (leader) gọi Veo, các rows trùng prompt
+    được link tới kết quả thay vì generate lại.
+    """
+    prompt_hash = fields.StringField(required=True, unique=True, max_length=64)
+    prompt = fields.StringField(required=True)  # Normalized prompt
+    aspect_ratio = fields.StringField(max_length=10)
+    resolution = fields.StringField(max_length=10)
+    model = fields.StringField(max_length=100)
+    status = fields.StringField(
+        max_length=20,
+        choices=['processing', 'completed', 'failed'],
+        default='processing'
+    )
+    leader = fields.ObjectIdField(required=True)  # VideoGeneration calling Veo
+    error_message = fields.StringField(default=None)  # Why the leader failed
+    permanent_failure = fields.BooleanField(default=False)  # Same prompt would fail again: rows fail with the leader
+    video_url = fields.URLField(default=None)
+    video_file_path = fields.StringField(default=None)
+    video_file_size = fields.IntField(default=None)
+    video_checksum = fields.StringField(max_length=32, default=None)
+    created_at = fields.DateTimeField(default=datetime.utcnow)
+    updated_at = fields.DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'prompt_assets',
+        'indexes': ['leader']
+    }
+    
+    def __str__(self):
+        return f"Asset {self.prompt_hash[:12]} - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.utcnow()
+        return super().save(*args, **kwargs)
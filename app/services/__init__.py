@@ -1,2 +1,35 @@
 # Services package
 
+import os
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def init_api_clients():
+    """
+    Tạo sẵn Gemini và Veo clients cho process hiện tại
+
+    Được gọi khi Django khởi động và trong Celery worker_process_init (sau khi fork,
+    clients của parent process không được dùng lại). Service chưa có API key được bỏ qua,
+    client sẽ được tạo ở lần gọi đầu tiên.
+    """
+    from . import gemini_service, veo_service, download_service
+
+    gemini_service.reset_client()
+    veo_service.reset_client()
+    download_service.reset_session()
+
+    clients = (
+        ('Gemini', 'GEMINI_API_KEY', gemini_service.get_gemini_client),
+        ('Veo', 'VEO_API_KEY', veo_service.get_veo_client),
+    )
+    for name, key_setting, get_client in clients:
+        if not (os.getenv(key_setting) or getattr(settings, key_setting, None)):
+            logger.debug(f"{key_setting} not set, skipping {name} client initialization")
+            continue
+        try:
+            get_client()
+        except Exception as e:
+            logger.warning(f"{name} client not initialized at startup: {str(e)}")
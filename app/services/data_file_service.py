@@ -0,0 +1,377 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DATA_FILES_DIR = os.path.join('uploads', 'data_files')
+SNAPSHOT_SUFFIX = '.columns'
+SNAPSHOT_MANIFEST = 'manifest.json'
+SNAPSHOT_VERSION = 2
+
+
+class FileTooLargeError(ValueError):
+    """Uploaded file vượt quá giới hạn DATA_FILE_MAX_UPLOAD_SIZE"""
+
+
+def get_max_upload_size() -> int:
+    """Get max upload size in bytes (0 = unlimited)"""
+    return int(getattr(settings, 'DATA_FILE_MAX_UPLOAD_SIZE', 0) or 0)
+
+
+def _reserve_file(relative_path: str):
+    """
+    Mở file mới (exclusive create) tại một tên chưa tồn tại trong MEDIA_ROOT
+
+    Returns:
+        Tuple (relative_path, full_path, file handle)
+    """
+    while True:
+        relative_path = default_storage.get_available_name(relative_path)
+        full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        try:
+            return relative_path, full_path, open(full_path, 'xb')
+        except FileExistsError:
+            # Another upload took the name between the check and the open
+            continue
+
+
+def save_uploaded_file(uploaded_file, upload_dir: str = DATA_FILES_DIR) -> dict:
+    """
+    Stream uploaded file xuống MEDIA_ROOT theo từng chunk, không buffer toàn bộ file trong memory
+
+    Args:
+        uploaded_file: Django UploadedFile từ request.FILES
+        upload_dir: Thư mục đích (relative to MEDIA_ROOT)
+
+    Returns:
+        Dict chứa file_path (relative to MEDIA_ROOT), full_path, size, sha256
+
+    Raises:
+        FileTooLargeError: Nếu file vượt quá DATA_FILE_MAX_UPLOAD_SIZE
+    """
+    max_size = get_max_upload_size()
+    if max_size and uploaded_file.size and uploaded_file.size > max_size:
+        raise FileTooLargeError(
+            f"File is too large ({uploaded_file.size} bytes). Maximum allowed size is {max_size} bytes."
+        )
+
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, upload_dir), exist_ok=True)
+    relative_path = default_storage.generate_filename(
+        os.path.join(upload_dir, os.path.basename(uploaded_file.name))
+    )
+    relative_path, full_path, destination = _reserve_file(relative_path)
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with destination:
+            for chunk in uploaded_file.chunks():
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise FileTooLargeError(
+                        f"File is too large. Maximum allowed size is {max_size} bytes."
+                    )
+                hasher.update(chunk)
+                destination.write(chunk)
+    except Exception:
+        # Don't leave partial uploads behind
+        try:
+            os.remove(full_path)
+        except OSError:
+            pass
+        raise
+
+    logger.info(f"Saved uploaded file {relative_path} ({size} bytes)")
+    return {
+        'file_path': relative_path,
+        'full_path': full_path,
+        'size': size,
+        'sha256': hasher.hexdigest(),
+    }
+
+
+def read_data_file(full_path: str, file_type: str) -> pd.DataFrame:
+    """
+    Parse toàn bộ file CSV/Excel thành DataFrame, giữ nguyên tên cột gốc
+
+    Args:
+        full_path: Absolute path tới file
+        file_type: 'csv' hoặc 'xlsx'
+
+    Returns:
+        DataFrame với tên cột là string
+    """
+    if file_type == 'csv':
+        # Read CSV with original column names, handle encoding
+        df = pd.read_csv(full_path, encoding='utf-8-sig')
+    else:
+        # Read Excel with original column names
+        df = pd.read_excel(full_path, engine='openpyxl')
+
+    # Preserve Vietnamese characters, spaces, etc. but make sure names are strings
+    df.columns = [str(col) for col in df.columns]
+    return df
+
+
+def _records(df: pd.DataFrame) -> list:
+    """Convert DataFrame thành list of dicts JSON-safe (NaN -> None)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def count_csv_rows(full_path: str, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Đếm số data rows của CSV bằng cách stream file và đếm newline (constant memory)
+
+    Quoted cells chứa newline và blank lines làm kết quả lớn hơn thực tế;
+    số rows chính xác được cập nhật khi column snapshot được build.
+
+    Returns:
+        Số rows (không tính header)
+    """
+    lines = 0
+    last_byte = b''
+    with open(full_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+    if last_byte and last_byte != b'\n':
+        # Last line has no trailing newline
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def count_xlsx_rows(full_path: str) -> int:
+    """
+    Đếm số data rows của sheet đầu tiên bằng openpyxl read-only mode
+
+    Returns:
+        Số rows (không tính header)
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(full_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        max_row = sheet.max_row
+        if max_row is None:
+            # Sheet has no dimension record, stream through the rows instead
+            max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+        return max(max_row - 1, 0)
+    finally:
+        workbook.close()
+
+
+def inspect_data_file(full_path: str, file_type: str, preview_rows: int = 5) -> dict:
+    """
+    Đọc header, preview và số rows của file mà không load toàn bộ file vào memory
+
+    Args:
+        full_path: Absolute path tới file
+        file_type: 'csv' hoặc 'xlsx'
+        preview_rows: Số rows trả về trong preview
+
+    Returns:
+        Dict chứa columns, total_rows, preview
+    """
+    if file_type == 'csv':
+        preview = pd.read_csv(full_path, encoding='utf-8-sig', nrows=preview_rows)
+        total_rows = count_csv_rows(full_path)
+    else:
+        # pandas stops reading the read-only workbook after nrows
+        preview = pd.read_excel(full_path, engine='openpyxl', nrows=preview_rows)
+        total_rows = count_xlsx_rows(full_path)
+
+    return {
+        'columns': [str(col) for col in preview.columns],
+        'total_rows': total_rows,
+        'preview': _records(preview),
+    }
+
+def _column_to_arrays(series: pd.Series) -> dict:
+    """
+    Convert một column thành các numpy arrays có thể memory-map (không dùng object dtype)
+
+    Numeric / bool / datetime columns map thẳng sang fixed-width array. Text và mixed
+    columns được lưu thành UTF-8 bytes nối liền + offsets (int64, len = rows + 1) + null mask,
+    nên dung lượng tỉ lệ với lượng text thực tế thay vì rows * cell dài nhất.
+
+    Returns:
+        Dict array name -> array ('values', hoặc 'data' + 'offsets' + 'mask')
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+        # Missing floats stay NaN and missing datetimes stay NaT
+        return {'values': series.to_numpy()}
+
+    mask = series.isna().to_numpy()
+    encoded = [value.encode('utf-8') for value in series.where(~mask, '').astype(str)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return {'data': data, 'offsets': offsets, 'mask': mask}
+
+
+def build_column_snapshot(df: pd.DataFrame, file_path: str) -> str:
+    """
+    Ghi DataFrame thành snapshot dạng cột (.npy mỗi array) cạnh file gốc
+
+    Args:
+        df: DataFrame đã parse từ file gốc
+        file_path: Path của file gốc (relative to MEDIA_ROOT)
+
+    Returns:
+        Path của snapshot directory (relative to MEDIA_ROOT)
+    """
+    snapshot_path = file_path + SNAPSHOT_SUFFIX
+    full_snapshot_path = os.path.join(settings.MEDIA_ROOT, snapshot_path)
+    tmp_path = full_snapshot_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'total_rows': len(df),
+        'columns': [],
+    }
+    for i, name in enumerate(df.columns):
+        arrays = _column_to_arrays(df.iloc[:, i])
+        column_info = {'name': str(name), 'arrays': {}}
+        for key, values in arrays.items():
+            file_name = f'col_{i}.{key}.npy'
+            np.save(os.path.join(tmp_path, file_name), values, allow_pickle=False)
+            column_info['arrays'][key] = file_name
+        manifest['columns'].append(column_info)
+
+    with open(os.path.join(tmp_path, SNAPSHOT_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    # Swap in the finished snapshot so readers never see a partial one
+    shutil.rmtree(full_snapshot_path, ignore_errors=True)
+    os.rename(tmp_path, full_snapshot_path)
+
+    logger.info(f"Built column snapshot {snapshot_path} ({len(df)} rows, {len(df.columns)} columns)")
+    return snapshot_path
+
+
+class ColumnSnapshot:
+    """Đọc snapshot dạng cột bằng memory-map, chỉ load các rows được yêu cầu"""
+
+    def __init__(self, snapshot_path: str):
+        self.path = os.path.join(settings.MEDIA_ROOT, snapshot_path)
+        with open(os.path.join(self.path, SNAPSHOT_MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+        self.total_rows = manifest['total_rows']
+        self._columns = manifest['columns']
+        self.columns = [col['name'] for col in self._columns]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.total_rows
+
+    def _load(self, file_name: str) -> np.ndarray:
+        if file_name not in self._arrays:
+            full_path = os.path.join(self.path, file_name)
+            try:
+                self._arrays[file_name] = np.load(full_path, mmap_mode='r')
+            except ValueError:
+                # Empty arrays (e.g. a text column of empty cells) cannot be memory-mapped
+                self._arrays[file_name] = np.load(full_path)
+        return self._arrays[file_name]
+
+    def _text_slice(self, arrays: dict, start: int, stop: int) -> np.ndarray:
+        """Decode text cells [start, stop) từ UTF-8 data + offsets"""
+        offsets = np.array(self._load(arrays['offsets'])[start:stop + 1])
+        if len(offsets) < 2:
+            return np.empty(0, dtype=object)
+        base = int(offsets[0])
+        buffer = self._load(arrays['data'])[base:int(offsets[-1])].tobytes()
+        relative = offsets - base
+        values = np.empty(len(offsets) - 1, dtype=object)
+        for i in range(len(values)):
+            values[i] = buffer[relative[i]:relative[i + 1]].decode('utf-8')
+        values[self._load(arrays['mask'])[start:stop]] = np.nan
+        return values
+
+    def slice(self, start: int, stop: int) -> pd.DataFrame:
+        """Build DataFrame cho rows [start, stop), index giữ nguyên row index gốc"""
+        stop = min(stop, self.total_rows)
+        data = {}
+        for col in self._columns:
+            arrays = col['arrays']
+            if 'offsets' in arrays:
+                data[col['name']] = self._text_slice(arrays, start, stop)
+            else:
+                data[col['name']] = np.array(self._load(arrays['values'])[start:stop])
+        return pd.DataFrame(data, columns=self.columns, index=pd.RangeIndex(start, stop))
+
+    def iter_batches(self, batch_size: int):
+        """Yield DataFrame cho từng batch rows"""
+        for start in range(0, self.total_rows, batch_size):
+            yield self.slice(start, start + batch_size)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.slice(0, self.total_rows)
+
+
+def open_snapshot(data_file):
+    """
+    Open column snapshot của DataFile nếu có
+
+    Returns:
+        ColumnSnapshot hoặc None nếu snapshot chưa được build / không đọc được
+    """
+    if not getattr(data_file, 'snapshot_path', None):
+        return None
+    try:
+        return ColumnSnapshot(data_file.snapshot_path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not open column snapshot {data_file.snapshot_path}: {str(e)}")
+        return None
+
+
+def load_dataframe(data_file) -> pd.DataFrame:
+    """
+    Load dữ liệu của DataFile, ưu tiên snapshot dạng cột thay vì parse lại file gốc
+
+    Args:
+        data_file: DataFile document
+
+    Returns:
+        DataFrame với index là row index gốc
+    """
+    snapshot = open_snapshot(data_file)
+    if snapshot is not None:
+        return snapshot.to_dataframe()
+
+    logger.info(f"No column snapshot for {data_file.file_path}, parsing original file")
+    full_path = os.path.join(settings.MEDIA_ROOT, data_file.file_path)
+    return read_data_file(full_path, data_file.file_type)
+
+
+def iter_row_batches(data_file, batch_size: int):
+    """
+    Yield DataFrame theo batch rows của DataFile (memory-mapped nếu có snapshot)
+
+    Args:
+        data_file: DataFile document
+        batch_size: Số rows mỗi batch
+    """
+    snapshot = open_snapshot(data_file)
+    if snapshot is not None:
+        yield from snapshot.iter_batches(batch_size)
+        return
+
+    df = load_dataframe(data_file)
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
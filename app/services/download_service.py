@@ -0,0 +1,176 @@
+import os
+import base64
+import hashlib
+import logging
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+VIDEOS_DIR = 'videos'
+PARTIAL_SUFFIX = '.part'
+
+# Hosts serving Veo files, downloads from them need the API key
+GOOGLE_API_HOSTS = ('generativelanguage.googleapis.com',)
+
+# Process-wide HTTP session: one connection pool shared by all download threads
+_session = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """Download không hoàn tất hoặc file tải về không khớp size/checksum"""
+
+
+def get_session() -> requests.Session:
+    """Get requests Session dùng chung connection pool (size = VIDEO_DOWNLOAD_CONCURRENCY)"""
+    global _session
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            pool_size = max(int(getattr(settings, 'VIDEO_DOWNLOAD_CONCURRENCY', 4)), 1)
+            # Only retry connection setup here; interrupted bodies are resumed with Range requests
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=Retry(total=3, read=0, status=0, backoff_factor=1)
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+
+def reset_session():
+    """Drop cached HTTP session (gọi trong child process sau khi fork)"""
+    global _session
+    with _session_lock:
+        _session = None
+
+
+def video_file_path(project_id: str, video_id: str) -> str:
+    """Path của video file (relative to MEDIA_ROOT)"""
+    return os.path.join(VIDEOS_DIR, str(project_id), f"{video_id}.mp4")
+
+
+def _request_headers(url: str) -> dict:
+    headers = {}
+    if urlparse(url).hostname in GOOGLE_API_HOSTS:
+        api_key = os.getenv('VEO_API_KEY') or getattr(settings, 'VEO_API_KEY', None)
+        if api_key:
+            headers['x-goog-api-key'] = api_key
+    return headers
+
+
+def _expected_md5(response) -> str:
+    """MD5 (hex) của toàn bộ file từ x-goog-hash / Content-MD5 header, None nếu server không gửi"""
+    values = [value.strip() for value in response.headers.get('x-goog-hash', '').split(',')]
+    values.append('md5=' + response.headers.get('Content-MD5', ''))
+    for value in values:
+        if value.startswith('md5=') and len(value) > 4:
+            try:
+                return base64.b64decode(value[4:]).hex()
+            except ValueError:
+                continue
+    return None
+
+
+def _expected_total_size(response, offset: int) -> int:
+    """Tổng size của file từ Content-Range / Content-Length, None nếu không biết"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+
+def _hash_file(path: str, hasher, chunk_size: int):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+
+
+def download_video(url: str, relative_path: str) -> dict:
+    """
+    Stream video về MEDIA_ROOT theo từng chunk (constant memory), resume từ file .part nếu có
+
+    Args:
+        url: Remote video URL
+        relative_path: Đích (relative to MEDIA_ROOT)
+
+    Returns:
+        Dict chứa file_path, size, md5
+
+    Raises:
+        DownloadError: Nếu size/checksum không khớp
+        requests.RequestException: Nếu có lỗi network (file .part được giữ lại để resume)
+    """
+    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    partial_path = full_path + PARTIAL_SUFFIX
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    chunk_size = int(getattr(settings, 'VIDEO_DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+    timeout = (10, int(getattr(settings, 'VIDEO_DOWNLOAD_READ_TIMEOUT', 60)))
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+
+    headers = _request_headers(url)
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416 and offset:
+            # Partial file is not a prefix of the remote file anymore, start over
+            logger.warning(f"Range not satisfiable for {relative_path}, restarting download")
+            os.remove(partial_path)
+            return download_video(url, relative_path)
+        response.raise_for_status()
+
+        if offset and response.status_code != 206:
+            # Server ignored the Range header and sends the whole file
+            logger.info(f"Server does not support resume for {relative_path}, restarting download")
+            offset = 0
+
+        expected_size = _expected_total_size(response, offset)
+        expected_md5 = _expected_md5(response)
+
+        hasher = hashlib.md5()
+        if offset:
+            _hash_file(partial_path, hasher, chunk_size)
+            logger.info(f"Resuming download of {relative_path} at byte {offset}")
+
+        size = offset
+        with open(partial_path, 'ab' if offset else 'wb') as destination:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    destination.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+
+    if expected_size is not None and size != expected_size:
+        if size > expected_size:
+            os.remove(partial_path)
+        raise DownloadError(f"Incomplete download of {relative_path}: {size} of {expected_size} bytes")
+
+    md5 = hasher.hexdigest()
+    if expected_md5 and md5 != expected_md5:
+        os.remove(partial_path)
+        raise DownloadError(f"Checksum mismatch for {relative_path}: expected {expected_md5}, got {md5}")
+
+    os.replace(partial_path, full_path)
+    logger.info(f"Downloaded {relative_path} ({size} bytes)")
+    return {
+        'file_path': relative_path,
+        'size': size,
+        'md5': md5,
+    }
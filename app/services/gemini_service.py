@@ -1,46 +1,127 @@
 import os
+import json
+import time
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from django.conf import settings
+from .redis_service import get_redis
 
 logger = logging.getLogger(__name__)
 
 
+def _get_model_name() -> str:
+    return os.getenv('GEMINI_MODEL') or getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash')
+
+
+# Process-wide Gemini state: genai.configure() resets the SDK's cached transport,
+# so it must run once per process instead of once per request
+_configured_api_key = None
+_models = {}
+_client_lock = threading.Lock()
+
+
 def get_gemini_client():
-    """Initialize Gemini client"""
+    """Get Gemini model, dùng chung một instance (và connection) cho cả process"""
+    global _configured_api_key
     try:
-        api_key = os.getenv('GEMINI_API_KEY') or getattr(settings, 'GEMINI_API_KEY', None)
-        if not api_key:
-            error_msg = "GEMINI_API_KEY not found in environment variables or settings"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
+        model_name = _get_model_name()
+        model = _models.get(model_name)
+        if model is not None:
+            return model
         
-        genai.configure(api_key=api_key)
-        # Using gemini-1.5-flash (can be changed to gemini-2.0-flash-exp or other models)
-        model_name = os.getenv('GEMINI_MODEL') or getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash')
-        logger.debug(f"Initializing Gemini model: {model_name}")
-        return genai.GenerativeModel(model_name)
+        with _client_lock:
+            model = _models.get(model_name)
+            if model is not None:
+                return model
+            
+            api_key = os.getenv('GEMINI_API_KEY') or getattr(settings, 'GEMINI_API_KEY', None)
+            if not api_key:
+                error_msg = "GEMINI_API_KEY not found in environment variables or settings"
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+            
+            if _configured_api_key != api_key:
+                genai.configure(api_key=api_key)
+                _configured_api_key = api_key
+            
+            # Using gemini-1.5-flash (can be changed to gemini-2.0-flash-exp or other models)
+            logger.debug(f"Initializing Gemini model: {model_name}")
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+            return model
     
     except Exception as e:
         logger.error(f"Error initializing Gemini client: {str(e)}", exc_info=True)
         raise
 
 
-def generate_prompt_suggestion(template: str, data_fields: list) -> str:
+def reset_client():
+    """Drop cached Gemini state (gọi trong child process sau khi fork)"""
+    global _configured_api_key
+    with _client_lock:
+        _configured_api_key = None
+        _models.clear()
+
+
+RESPONSE_CACHE_PREFIX = 'agentvideo:gemini_cache:'
+RESPONSE_CACHE_INDEX = 'agentvideo:gemini_cache_index'
+
+
+def _response_cache_key(kind: str, template: str, data_fields: list, context: str = "") -> str:
+    """Cache key = hash của (model, loại request, template, sorted fields, context)"""
+    payload = json.dumps(
+        [_get_model_name(), kind, template, sorted(str(field) for field in data_fields), context or ""],
+        ensure_ascii=False
+    )
+    return RESPONSE_CACHE_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _get_cached_response(key: str):
+    """Đọc Gemini response đã cache, None nếu không có hoặc Redis lỗi"""
+    try:
+        return get_redis().get(key)
+    except Exception as e:
+        logger.warning(f"Gemini response cache unavailable: {str(e)}")
+        return None
+
+
+def _set_cached_response(key: str, value: str):
     """
-    Sử dụng Gemini để suggest prompt tốt hơn dựa trên template và data fields
-    
-    Args:
-        template: Prompt template hiện tại với {{field}} placeholders
-        data_fields: Danh sách các field names từ CSV/Excel
-    
-    Returns:
-        Enhanced prompt suggestion từ Gemini
-    
-    Raises:
-        ValueError: Nếu template hoặc data_fields rỗng
-        Exception: Nếu có lỗi khi gọi Gemini API
+    Lưu Gemini response với TTL, giữ tối đa GEMINI_CACHE_MAX_ENTRIES entries
+
+    Entries cũ nhất bị evict trước (index là sorted set theo thời gian ghi).
     """
+    _set_cached_responses({key: value})
+
+
+def _set_cached_responses(values: dict, index: str = RESPONSE_CACHE_INDEX, max_entries: int = None):
+    """Lưu nhiều Gemini responses trong một pipeline, evict entries cũ nhất của index khi vượt max_entries"""
+    ttl = int(getattr(settings, 'GEMINI_CACHE_TTL_SECONDS', 86400))
+    if max_entries is None:
+        max_entries = int(getattr(settings, 'GEMINI_CACHE_MAX_ENTRIES', 1000))
+    if ttl <= 0 or max_entries <= 0 or not values:
+        return
+    try:
+        redis_client = get_redis()
+        now = time.time()
+        with redis_client.pipeline(transaction=True) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, ex=ttl)
+            pipe.zadd(index, {key: now for key in values})
+            pipe.zcard(index)
+            size = pipe.execute()[-1]
+        if size > max_entries:
+            evicted = [member for member, _ in redis_client.zpopmin(index, size - max_entries)]
+            if evicted:
+                redis_client.delete(*evicted)
+    except Exception as e:
+        logger.warning(f"Could not cache Gemini response: {str(e)}")
+
+
+def _validate_suggestion_input(template: str, data_fields: list):
     if not template or not template.strip():
         error_msg = "Template cannot be empty"
         logger.error(error_msg)
@@ -50,14 +131,12 @@ def generate_prompt_suggestion(template: str, data_fields: list) -> str:
         error_msg = "Data fields list cannot be empty"
         logger.error(error_msg)
         raise ValueError(error_msg)
+
+
+def _build_suggestion_prompt(template: str, data_fields: list) -> str:
+    fields_description = ", ".join([f"{{{{{field}}}}}" for field in data_fields])
     
-    try:
-        logger.info(f"Generating prompt suggestion with {len(data_fields)} fields")
-        model = get_gemini_client()
-        
-        fields_description = ", ".join([f"{{{{{field}}}}}" for field in data_fields])
-        
-        prompt = f"""Bạn là một chuyên gia viết prompt cho video generation.
+    return f"""Bạn là một chuyên gia viết prompt cho video generation.
 
 Template prompt hiện tại:
 {template}
@@ -73,7 +152,37 @@ Hãy cải thiện prompt này để:
 
 Chỉ trả về prompt đã được cải thiện, không thêm giải thích hay comment."""
 
-        response = model.generate_content(prompt)
+
+def generate_prompt_suggestion(template: str, data_fields: list, force_refresh: bool = False) -> str:
+    """
+    Sử dụng Gemini để suggest prompt tốt hơn dựa trên template và data fields
+    
+    Args:
+        template: Prompt template hiện tại với {{field}} placeholders
+        data_fields: Danh sách các field names từ CSV/Excel
+        force_refresh: Bỏ qua response cache và gọi Gemini lại
+    
+    Returns:
+        Enhanced prompt suggestion từ Gemini
+    
+    Raises:
+        ValueError: Nếu template hoặc data_fields rỗng
+        Exception: Nếu có lỗi khi gọi Gemini API
+    """
+    _validate_suggestion_input(template, data_fields)
+    
+    cache_key = _response_cache_key('suggest', template, data_fields)
+    if not force_refresh:
+        cached = _get_cached_response(cache_key)
+        if cached:
+            logger.info("Returning cached prompt suggestion")
+            return cached
+    
+    try:
+        logger.info(f"Generating prompt suggestion with {len(data_fields)} fields")
+        model = get_gemini_client()
+        
+        response = model.generate_content(_build_suggestion_prompt(template, data_fields))
         
         if not response or not response.text:
             error_msg = "Empty response from Gemini API"
@@ -82,6 +191,7 @@ Chỉ trả về prompt đã được cải thiện, không thêm giải thích
         
         suggested_prompt = response.text.strip()
         logger.info(f"Successfully generated prompt suggestion (length: {len(suggested_prompt)})")
+        _set_cached_response(cache_key, suggested_prompt)
         return suggested_prompt
     
     except ValueError:
@@ -92,7 +202,64 @@ Chỉ trả về prompt đã được cải thiện, không thêm giải thích
         raise Exception(error_msg) from e
 
 
-def enhance_prompt(template: str, data_fields: list, context: str = "") -> str:
+def stream_prompt_suggestion(template: str, data_fields: list, force_refresh: bool = False):
+    """
+    Giống generate_prompt_suggestion nhưng yield từng đoạn text ngay khi Gemini trả về
+    
+    Args:
+        template: Prompt template hiện tại với {{field}} placeholders
+        data_fields: Danh sách các field names từ CSV/Excel
+        force_refresh: Bỏ qua response cache và gọi Gemini lại
+    
+    Yields:
+        Text chunks; cached suggestion được yield một lần
+    
+    Raises:
+        ValueError: Nếu template hoặc data_fields rỗng
+        Exception: Nếu có lỗi khi gọi Gemini API
+    """
+    _validate_suggestion_input(template, data_fields)
+    
+    cache_key = _response_cache_key('suggest', template, data_fields)
+    if not force_refresh:
+        cached = _get_cached_response(cache_key)
+        if cached:
+            logger.info("Returning cached prompt suggestion")
+            yield cached
+            return
+    
+    try:
+        logger.info(f"Streaming prompt suggestion with {len(data_fields)} fields")
+        model = get_gemini_client()
+        
+        parts = []
+        for chunk in model.generate_content(_build_suggestion_prompt(template, data_fields), stream=True):
+            text = chunk.text if chunk.parts else ''
+            if text:
+                # Drop leading whitespace of the answer, like .strip() does for the full text
+                if not parts:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                parts.append(text)
+                yield text
+        
+        suggested_prompt = ''.join(parts).strip()
+        if not suggested_prompt:
+            error_msg = "Empty response from Gemini API"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        logger.info(f"Successfully streamed prompt suggestion (length: {len(suggested_prompt)})")
+        _set_cached_response(cache_key, suggested_prompt)
+    
+    except Exception as e:
+        error_msg = f"Error calling Gemini API: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        raise Exception(error_msg) from e
+
+
+def enhance_prompt(template: str, data_fields: list, context: str = "", force_refresh: bool = False) -> str:
     """
     Enhance prompt với context bổ sung
     
@@ -100,6 +267,7 @@ def enhance_prompt(template: str, data_fields: list, context: str = "") -> str:
         template: Prompt template hiện tại
         data_fields: Danh sách các field names
         context: Context bổ sung (optional)
+        force_refresh: Bỏ qua response cache và gọi Gemini lại
     
     Returns:
         Enhanced prompt
@@ -118,6 +286,13 @@ def enhance_prompt(template: str, data_fields: list, context: str = "") -> str:
         logger.error(error_msg)
         raise ValueError(error_msg)
     
+    cache_key = _response_cache_key('enhance', template, data_fields, context)
+    if not force_refresh:
+        cached = _get_cached_response(cache_key)
+        if cached:
+            logger.info("Returning cached enhanced prompt")
+            return cached
+    
     try:
         logger.info(f"Enhancing prompt with {len(data_fields)} fields, context: {bool(context)}")
         model = get_gemini_client()
@@ -145,6 +320,7 @@ Chỉ trả về prompt đã cải thiện."""
         
         enhanced_prompt = response.text.strip()
         logger.info(f"Successfully enhanced prompt (length: {len(enhanced_prompt)})")
+        _set_cached_response(cache_key, enhanced_prompt)
         return enhanced_prompt
     
     except ValueError:
@@ -154,3 +330,138 @@ Chỉ trả về prompt đã cải thiện."""
         logger.error(error_msg, exc_info=True)
         raise Exception(error_msg) from e
 
+
+
+ROW_CACHE_INDEX = 'agentvideo:gemini_row_cache_index'
+
+
+def _row_cache_key(prompt: str) -> str:
+    """Cache key của một rendered row prompt = hash của (model, prompt)"""
+    payload = json.dumps([_get_model_name(), 'row', prompt], ensure_ascii=False)
+    return RESPONSE_CACHE_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _build_row_enrichment_prompt(prompts: list) -> str:
+    items = json.dumps(
+        [{'id': i, 'prompt': prompt} for i, prompt in enumerate(prompts)],
+        ensure_ascii=False
+    )
+    
+    return f"""Bạn là một chuyên gia viết prompt cho video generation.
+
+Dưới đây là danh sách prompts (JSON), mỗi prompt sẽ tạo một video riêng:
+{items}
+
+Hãy cải thiện từng prompt để:
+1. Mô tả chi tiết, rõ ràng về cảnh, chuyển động, ánh sáng và góc máy
+2. Giữ nguyên toàn bộ thông tin (tên, số liệu, địa điểm) có trong prompt gốc
+3. Giữ ngôn ngữ của prompt gốc
+
+Trả về JSON object dạng {{"prompts": [{{"id": <id>, "prompt": "<prompt đã cải thiện>"}}]}} với đúng một phần tử cho mỗi id, không thêm giải thích."""
+
+
+def _enrich_prompt_batch(prompts: list) -> list:
+    """
+    Gửi một batch rendered prompts trong một Gemini request với JSON output
+
+    Returns:
+        List cùng độ dài với prompts, None cho rows Gemini không trả về
+    """
+    model = get_gemini_client()
+    response = model.generate_content(
+        _build_row_enrichment_prompt(prompts),
+        generation_config={'response_mime_type': 'application/json'}
+    )
+    
+    if not response or not response.text:
+        raise Exception("Empty response from Gemini API")
+    
+    data = json.loads(response.text)
+    items = data.get('prompts', []) if isinstance(data, dict) else data
+    
+    enriched = [None] * len(prompts)
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get('id')
+        text = item.get('prompt')
+        if isinstance(index, int) and 0 <= index < len(prompts) and isinstance(text, str) and text.strip():
+            enriched[index] = text.strip()
+    return enriched
+
+
+def enrich_row_prompts(prompts: list) -> list:
+    """
+    Dùng Gemini cải thiện rendered prompt của từng row trước khi gửi lên Veo
+    
+    Nhiều rows được gộp vào một request (GEMINI_ENRICHMENT_BATCH_SIZE), các requests
+    chạy song song (GEMINI_ENRICHMENT_CONCURRENCY). Kết quả được cache theo hash
+    của từng prompt; rows lỗi hoặc không có kết quả giữ nguyên prompt gốc.
+    
+    Args:
+        prompts: List of rendered prompts
+    
+    Returns:
+        List of prompts cùng thứ tự và độ dài với input
+    """
+    if not prompts:
+        return []
+    
+    result = list(prompts)
+    keys = [_row_cache_key(prompt) for prompt in prompts]
+    
+    try:
+        cached = get_redis().mget(keys)
+    except Exception as e:
+        logger.warning(f"Gemini response cache unavailable: {str(e)}")
+        cached = [None] * len(prompts)
+    
+    # Identical rendered prompts only need to be enriched once
+    pending = {}
+    for index, (prompt, value) in enumerate(zip(prompts, cached)):
+        if value:
+            result[index] = value
+        else:
+            pending.setdefault(prompt, []).append(index)
+    
+    if not pending:
+        logger.info(f"Row enrichment: all {len(prompts)} prompts served from cache")
+        return result
+    
+    unique_prompts = list(pending)
+    batch_size = max(int(getattr(settings, 'GEMINI_ENRICHMENT_BATCH_SIZE', 20)), 1)
+    batches = [unique_prompts[start:start + batch_size] for start in range(0, len(unique_prompts), batch_size)]
+    
+    def run_batch(batch):
+        try:
+            return _enrich_prompt_batch(batch)
+        except Exception as e:
+            # Failover: these rows go to Veo with the unenhanced prompt
+            logger.warning(f"Row enrichment failed for {len(batch)} prompts, using original prompts: {str(e)}")
+            return [None] * len(batch)
+    
+    concurrency = max(int(getattr(settings, 'GEMINI_ENRICHMENT_CONCURRENCY', 4)), 1)
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as executor:
+        batch_results = list(executor.map(run_batch, batches))
+    
+    to_cache = {}
+    enriched_count = 0
+    for batch, enriched in zip(batches, batch_results):
+        for prompt, text in zip(batch, enriched):
+            if not text:
+                continue
+            enriched_count += 1
+            to_cache[_row_cache_key(prompt)] = text
+            for index in pending[prompt]:
+                result[index] = text
+    
+    _set_cached_responses(
+        to_cache,
+        index=ROW_CACHE_INDEX,
+        max_entries=int(getattr(settings, 'GEMINI_ROW_CACHE_MAX_ENTRIES', 50000))
+    )
+    logger.info(
+        f"Row enrichment: {len(prompts) - sum(len(v) for v in pending.values())} cached, "
+        f"{enriched_count}/{len(unique_prompts)} enriched in {len(batches)} requests"
+    )
+    return result
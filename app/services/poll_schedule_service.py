@@ -0,0 +1,95 @@
+import time
+import random
+import logging
+import statistics
+from django.conf import settings
+from .redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+DURATIONS_KEY_PREFIX = 'agentvideo:veo_durations:'
+MEDIAN_CACHE_SECONDS = 60
+
+# Per-process cache: key -> (expires_at, median or None)
+_median_cache = {}
+
+
+def durations_key(model: str, resolution: str) -> str:
+    """Redis list chứa thời gian generate (seconds) gần nhất của một model + resolution"""
+    return f'{DURATIONS_KEY_PREFIX}{model}:{resolution}'
+
+
+def record_durations(durations: list, model: str, resolution: str):
+    """
+    Lưu thời gian từ lúc submit đến lúc completed của các Veo operations
+
+    Chỉ giữ VEO_DURATION_SAMPLE_SIZE samples gần nhất.
+    """
+    durations = [round(seconds, 1) for seconds in durations if seconds and seconds > 0]
+    if not durations:
+        return
+    try:
+        sample_size = int(getattr(settings, 'VEO_DURATION_SAMPLE_SIZE', 200))
+        key = durations_key(model, resolution)
+        with get_redis().pipeline(transaction=True) as pipe:
+            pipe.lpush(key, *durations)
+            pipe.ltrim(key, 0, sample_size - 1)
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record Veo durations: {str(e)}")
+
+
+def get_median_duration(model: str, resolution: str):
+    """
+    Median thời gian generate đã quan sát (cache trong process MEDIAN_CACHE_SECONDS)
+
+    Returns:
+        Seconds, None nếu chưa đủ VEO_DURATION_MIN_SAMPLES samples hoặc Redis lỗi
+    """
+    key = durations_key(model, resolution)
+    cached = _median_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    median = None
+    try:
+        values = [float(value) for value in get_redis().lrange(key, 0, -1)]
+        if len(values) >= int(getattr(settings, 'VEO_DURATION_MIN_SAMPLES', 5)):
+            median = statistics.median(values)
+    except Exception as e:
+        logger.warning(f"Could not read Veo durations: {str(e)}")
+
+    _median_cache[key] = (time.monotonic() + MEDIAN_CACHE_SECONDS, median)
+    return median
+
+
+def _with_jitter(seconds: float) -> float:
+    jitter = float(getattr(settings, 'VEO_POLL_JITTER', 0.2))
+    return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+
+def first_poll_delay(model: str, resolution: str) -> float:
+    """
+    Seconds từ lúc submit đến lần poll đầu tiên
+
+    Gần median thời gian generate đã quan sát (VEO_POLL_FIRST_POLL_FRACTION), hoặc
+    VEO_POLL_DEFAULT_FIRST_DELAY_SECONDS khi chưa có statistics.
+    """
+    median = get_median_duration(model, resolution)
+    if median is None:
+        delay = float(getattr(settings, 'VEO_POLL_DEFAULT_FIRST_DELAY_SECONDS', 60))
+    else:
+        delay = median * float(getattr(settings, 'VEO_POLL_FIRST_POLL_FRACTION', 0.9))
+    return max(_with_jitter(delay), float(getattr(settings, 'VEO_POLL_MIN_INTERVAL_SECONDS', 5)))
+
+
+def next_poll_delay(poll_count: int) -> float:
+    """
+    Seconds đến lần poll tiếp theo khi operation chưa xong sau poll_count lần poll
+
+    Exponential backoff từ VEO_POLL_MIN_INTERVAL_SECONDS, tối đa VEO_POLL_MAX_INTERVAL_SECONDS, có jitter.
+    """
+    base = float(getattr(settings, 'VEO_POLL_MIN_INTERVAL_SECONDS', 5))
+    cap = float(getattr(settings, 'VEO_POLL_MAX_INTERVAL_SECONDS', 60))
+    exponent = min(max(poll_count - 1, 0), 16)
+    return _with_jitter(min(cap, base * 2 ** exponent))
@@ -0,0 +1,173 @@
+import json
+import logging
+from bson import ObjectId
+from django.conf import settings
+from .redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+VIDEO_STATUSES = ['pending', 'processing', 'completed', 'failed']
+
+
+def project_channel(project_id: str) -> str:
+    """Redis pub/sub channel chứa status events của một project"""
+    return f'agentvideo:project_events:{project_id}'
+
+
+def progress_key(project_id: str) -> str:
+    """Redis hash chứa counters status -> count của một project"""
+    return f'agentvideo:project_progress:{project_id}'
+
+
+def _counts_from_hash(values: dict) -> dict:
+    counts = {status: max(int(values.get(status, 0) or 0), 0) for status in VIDEO_STATUSES}
+    counts['total'] = sum(counts[status] for status in VIDEO_STATUSES)
+    return counts
+
+
+def publish_status_change(project_id: str, video_id: str, status: str, previous_status: str = None, **fields):
+    """
+    Cập nhật progress counters và publish status transition của một video cho SSE clients
+
+    Counters được cập nhật atomically (MULTI/EXEC) cùng với việc đọc lại tổng số,
+    event gửi đi kèm counts mới nhất của project.
+
+    Args:
+        project_id: MongoDB ObjectId string of Project
+        video_id: MongoDB ObjectId string of VideoGeneration
+        status: Status mới
+        previous_status: Status trước đó (optional)
+        **fields: Dữ liệu bổ sung (video_url, error, ...)
+    """
+    message = {
+        'video_id': str(video_id),
+        'status': status,
+        'previous_status': previous_status,
+    }
+    message.update(fields)
+    try:
+        redis_client = get_redis()
+        key = progress_key(project_id)
+        if previous_status != status:
+            with redis_client.pipeline(transaction=True) as pipe:
+                if previous_status:
+                    pipe.hincrby(key, previous_status, -1)
+                pipe.hincrby(key, status, 1)
+                pipe.hgetall(key)
+                message['counts'] = _counts_from_hash(pipe.execute()[-1])
+        redis_client.publish(project_channel(project_id), json.dumps(message))
+    except Exception as e:
+        # Counters are rebuilt by reconcile_progress, the status endpoint is the source of truth
+        logger.warning(f"Could not publish status event for video {video_id}: {str(e)}")
+
+
+def add_pending(project_id: str, count: int):
+    """Tăng counter pending khi tạo mới VideoGeneration documents"""
+    if not count:
+        return
+    try:
+        get_redis().hincrby(progress_key(project_id), 'pending', count)
+    except Exception as e:
+        logger.warning(f"Could not update progress counters for project {project_id}: {str(e)}")
+
+
+def _aggregate_counts(project_id: str = None) -> dict:
+    """
+    Đếm videos theo (project, status) bằng một aggregation pipeline
+
+    Returns:
+        Dict project_id -> {status: count}
+    """
+    from ..mongodb_models import VideoGeneration
+
+    pipeline = []
+    if project_id:
+        pipeline.append({'$match': {'project': ObjectId(project_id)}})
+    pipeline.append({'$group': {'_id': {'project': '$project', 'status': '$status'}, 'count': {'$sum': 1}}})
+
+    projects = {}
+    for row in VideoGeneration._get_collection().aggregate(pipeline):
+        counts = projects.setdefault(str(row['_id']['project']), {})
+        counts[row['_id']['status']] = row['count']
+    return projects
+
+
+def get_status_counts(project_id: str) -> dict:
+    """
+    Đếm số videos theo status của project bằng Mongo aggregation (không dùng Redis)
+
+    Returns:
+        Dict status -> count, kèm total
+    """
+    return _counts_from_hash(_aggregate_counts(project_id).get(str(project_id), {}))
+
+
+def reconcile_progress(project_id: str = None) -> int:
+    """
+    Rebuild progress counters trong Redis từ Mongo
+
+    Args:
+        project_id: Chỉ rebuild project này (optional, mặc định tất cả projects)
+
+    Returns:
+        Số projects đã được rebuild
+    """
+    projects = _aggregate_counts(project_id)
+    if project_id:
+        projects.setdefault(str(project_id), {})
+
+    with get_redis().pipeline(transaction=False) as pipe:
+        for pid, counts in projects.items():
+            key = progress_key(pid)
+            pipe.delete(key)
+            pipe.hset(key, mapping={status: counts.get(status, 0) for status in VIDEO_STATUSES})
+        pipe.execute()
+    return len(projects)
+
+
+def get_progress(project_id: str) -> dict:
+    """
+    Đọc progress counters của project từ Redis (O(1)), rebuild từ Mongo nếu chưa có
+
+    Returns:
+        Dict status -> count, kèm total
+    """
+    try:
+        redis_client = get_redis()
+        values = redis_client.hgetall(progress_key(project_id))
+        if not values:
+            reconcile_progress(project_id)
+            values = redis_client.hgetall(progress_key(project_id))
+        return _counts_from_hash(values)
+    except Exception as e:
+        logger.warning(f"Progress counters unavailable for project {project_id}: {str(e)}")
+        return get_status_counts(project_id)
+
+
+async def subscribe_project_events(project_id: str, timeout: float = 15):
+    """
+    Async generator nhận status events của project từ Redis pub/sub
+
+    Yields:
+        Event dict, hoặc None khi không có event nào trong `timeout` giây (dùng để gửi keep-alive)
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    channel = project_channel(project_id)
+    await pubsub.subscribe(channel)
+    try:
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+            if message is None:
+                yield None
+                continue
+            try:
+                yield json.loads(message['data'])
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring malformed event on {channel}")
+    finally:
+        await pubsub.unsubscribe(channel)
+        await pubsub.aclose()
+        await client.aclose()
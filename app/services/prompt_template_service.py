@@ -0,0 +1,147 @@
+import re
+import json
+import hashlib
+import logging
+import unicodedata
+from functools import lru_cache
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# {{field}} placeholders; the text inside the braces is kept as typed so column
+# names with leading/trailing spaces still match (see CompiledTemplate.resolve_field)
+PLACEHOLDER_PATTERN = re.compile(r'\{\{(.+?)\}\}')
+
+
+def _column_as_text(series: pd.Series, missing: str) -> pd.Series:
+    """
+    Convert một column thành text để ghép vào prompt
+
+    Missing values (NaN/None/NaT) được thay bằng `missing`. Float columns
+    chứa số nguyên (do pandas upcast khi có ô trống) được render không có ".0".
+    """
+    mask = series.isna()
+    if series.dtype.kind == 'f':
+        values = series.where(~mask, 0)
+        text = values.map(lambda v: str(int(v)) if float(v).is_integer() else str(v))
+    else:
+        text = series.astype(object).map(str)
+    return text.where(~mask, missing).astype(object)
+
+
+class CompiledTemplate:
+    """Prompt template đã được parse thành danh sách segments (literal text / field)"""
+
+    def __init__(self, template: str):
+        self.template = template
+        self.segments = []  # List of (is_field, text)
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(template):
+            if match.start() > position:
+                self.segments.append((False, template[position:match.start()]))
+            self.segments.append((True, match.group(1)))
+            position = match.end()
+        if position < len(template):
+            self.segments.append((False, template[position:]))
+
+        # Unique field names in order of first appearance
+        self.fields = list(dict.fromkeys(text for is_field, text in self.segments if is_field))
+
+    @staticmethod
+    def resolve_field(field: str, columns):
+        """
+        Tìm column cho một placeholder: exact name trước, sau đó name đã bỏ khoảng trắng đầu/cuối
+
+        Returns:
+            Column name, None nếu không có column nào khớp
+        """
+        if field in columns:
+            return field
+        stripped = field.strip()
+        if stripped != field and stripped in columns:
+            return stripped
+        return None
+
+    def unknown_fields(self, columns) -> list:
+        """Trả về các placeholders không có trong columns"""
+        known = set(columns)
+        return [field for field in self.fields if self.resolve_field(field, known) is None]
+
+    def render(self, row: dict, missing: str = '') -> str:
+        """
+        Render template cho một row
+
+        Placeholders không có trong row được giữ nguyên.
+        """
+        parts = []
+        for is_field, text in self.segments:
+            if not is_field:
+                parts.append(text)
+                continue
+            column = self.resolve_field(text, row)
+            if column is None:
+                parts.append(f"{{{{{text}}}}}")
+            else:
+                value = row[column]
+                parts.append(missing if pd.isna(value) else str(value))
+        return ''.join(parts)
+
+    def render_dataframe(self, df: pd.DataFrame, missing: str = '') -> pd.Series:
+        """
+        Render template cho tất cả rows của DataFrame bằng vectorized string concatenation
+
+        Args:
+            df: DataFrame với columns là field names
+            missing: Text thay cho ô trống
+
+        Returns:
+            Series of rendered prompts, cùng index với df
+        """
+        result = pd.Series('', index=df.index, dtype=object)
+        columns = set(df.columns)
+        for is_field, text in self.segments:
+            if not is_field:
+                result = result + text
+                continue
+            column = self.resolve_field(text, columns)
+            if column is None:
+                result = result + f"{{{{{text}}}}}"
+            else:
+                result = result + _column_as_text(df[column], missing)
+        return result
+
+
+@lru_cache(maxsize=128)
+def compile_template(template: str) -> CompiledTemplate:
+    """Parse template một lần, kết quả được cache theo template string"""
+    return CompiledTemplate(template)
+
+
+def find_unknown_placeholders(template: str, columns) -> list:
+    """
+    Kiểm tra placeholders trong template có tồn tại trong columns của data file
+
+    Args:
+        template: Prompt template với {{field}} placeholders
+        columns: Danh sách column names của data file
+
+    Returns:
+        List of placeholder names không có trong columns
+    """
+    return compile_template(template).unknown_fields(columns)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Chuẩn hóa prompt trước khi hash: Unicode NFC, gộp whitespace, bỏ khoảng trắng đầu/cuối"""
+    return ' '.join(unicodedata.normalize('NFC', prompt or '').split())
+
+
+def prompt_hash(prompt: str, aspect_ratio: str, resolution: str, model: str) -> str:
+    """
+    Content address của một video: hash của normalized prompt và generation parameters
+
+    Returns:
+        SHA-256 hex digest
+    """
+    payload = json.dumps([model, aspect_ratio, resolution, normalize_prompt(prompt)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
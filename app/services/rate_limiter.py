@@ -0,0 +1,115 @@
+import random
+import logging
+from django.conf import settings
+from .redis_service import get_redis
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'agentvideo:veo:rate_bucket'
+IN_FLIGHT_KEY = 'agentvideo:veo:in_flight'
+
+# KEYS[1] = token bucket hash, KEYS[2] = in-flight sorted set (member -> lease expiry)
+# ARGV = rate per second, capacity, max in flight, member, lease seconds, max wait seconds
+# Returns {1, "0"} when a slot was taken, otherwise {0, "<seconds to wait>"}
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local max_in_flight = tonumber(ARGV[3])
+local member = ARGV[4]
+local lease = tonumber(ARGV[5])
+local max_wait = tonumber(ARGV[6])
+
+if max_in_flight > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+    if not redis.call('ZSCORE', KEYS[2], member) then
+        if redis.call('ZCARD', KEYS[2]) >= max_in_flight then
+            local oldest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+            local wait = math.min(tonumber(oldest[2]) - now, max_wait)
+            return {0, tostring(wait)}
+        end
+    end
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    return {0, tostring((1 - tokens) / rate)}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if max_in_flight > 0 then
+    redis.call('ZADD', KEYS[2], now + lease, member)
+end
+return {1, '0'}
+"""
+
+_acquire_script = None
+
+
+class RateLimited(Exception):
+    """Không lấy được slot Veo, cần reschedule sau retry_after giây"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Veo rate limit reached, retry after {retry_after:.1f}s")
+
+
+def _get_acquire_script():
+    global _acquire_script
+    if _acquire_script is None:
+        _acquire_script = get_redis().register_script(ACQUIRE_SCRIPT)
+    return _acquire_script
+
+
+def acquire_veo_slot(video_id: str) -> float:
+    """
+    Lấy một token từ distributed token bucket và một slot in-flight trước khi submit lên Veo
+
+    Args:
+        video_id: MongoDB ObjectId string of VideoGeneration (in-flight slot owner)
+
+    Returns:
+        0 nếu lấy được slot, ngược lại số giây cần chờ trước khi thử lại
+    """
+    rpm = float(getattr(settings, 'VEO_RATE_LIMIT_RPM', 10))
+    if rpm <= 0:
+        return 0
+    burst = float(getattr(settings, 'VEO_RATE_LIMIT_BURST', 0) or rpm)
+    max_in_flight = int(getattr(settings, 'VEO_MAX_IN_FLIGHT', 0))
+    lease = int(getattr(settings, 'VEO_IN_FLIGHT_LEASE_SECONDS', 1800))
+    max_wait = int(getattr(settings, 'VEO_RATE_LIMIT_MAX_WAIT_SECONDS', 60))
+
+    try:
+        allowed, wait = _get_acquire_script()(
+            keys=[BUCKET_KEY, IN_FLIGHT_KEY],
+            args=[rpm / 60.0, burst, max_in_flight, video_id, lease, max_wait],
+        )
+    except Exception as e:
+        # Fail open: a Redis outage should not stop generation
+        logger.warning(f"Veo rate limiter unavailable, submitting without limit: {str(e)}")
+        return 0
+
+    if int(allowed) == 1:
+        return 0
+
+    # Spread rescheduled tasks so they don't all come back at the same instant
+    retry_after = max(float(wait), 0.1) + random.uniform(0, 1)
+    logger.debug(f"Veo slot not available for video {video_id}, retry after {retry_after:.1f}s")
+    return retry_after
+
+
+def release_veo_slot(video_id: str):
+    """Trả lại slot in-flight khi Veo operation kết thúc hoặc submit thất bại"""
+    if not int(getattr(settings, 'VEO_MAX_IN_FLIGHT', 0)):
+        return
+    try:
+        get_redis().zrem(IN_FLIGHT_KEY, video_id)
+    except Exception as e:
+        logger.warning(f"Could not release Veo slot for video {video_id}: {str(e)}")
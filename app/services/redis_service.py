@@ -0,0 +1,24 @@
+import logging
+import threading
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get Redis client dùng chung connection pool trong process
+
+    Dùng cho các thao tác cần atomic command / Lua script mà Django cache không hỗ trợ.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logger.debug(f"Initializing Redis connection pool: {settings.REDIS_URL}")
+                _pool = redis.ConnectionPool.from_url(settings.REDIS_URL, decode_responses=True)
+    return redis.Redis(connection_pool=_pool)
@@ -1,33 +1,158 @@
 import os
+import re
 import time
 import logging
+import threading
+from email.utils import parsedate_to_datetime
 from django.conf import settings
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 
 logger = logging.getLogger(__name__)
 
+VEO_MODEL = "veo-3.1-fast-generate-preview"
+DEFAULT_ASPECT_RATIO = "16:9"
+DEFAULT_RESOLUTION = "720p"
+
+# Error classes of a failed Veo submission
+RATE_LIMIT = 'rate_limit'
+TRANSIENT = 'transient'
+INVALID_PROMPT = 'invalid_prompt'
+AUTH = 'auth'
+RETRYABLE_ERRORS = (RATE_LIMIT, TRANSIENT)
+
+TRANSIENT_STATUSES = ('UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'ABORTED')
+AUTH_STATUSES = ('UNAUTHENTICATED', 'PERMISSION_DENIED')
+RETRY_DELAY_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)s$')
+# google.rpc codes of failed operations that may succeed when generated again:
+# DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, ABORTED, INTERNAL, UNAVAILABLE
+TRANSIENT_OPERATION_CODES = (4, 8, 10, 13, 14)
+
+
+class VeoAPIError(Exception):
+    """Lỗi khi gọi Veo API, đã được phân loại (category) để quyết định có retry hay không"""
+
+    def __init__(self, message: str, category: str = TRANSIENT, retry_after: float = None):
+        super().__init__(message)
+        self.category = category
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.category in RETRYABLE_ERRORS
+
+
+# Process-wide Veo client: genai.Client keeps an HTTP connection pool with keep-alive,
+# so reusing it saves the TLS handshake and setup cost on every call
+_client = None
+_client_lock = threading.Lock()
+
 
 def get_veo_client():
-    """Get Veo client with API key"""
+    """Get Veo client with API key, dùng chung một instance cho cả process"""
+    global _client
+    if _client is not None:
+        return _client
+    
     try:
-        api_key = os.getenv('VEO_API_KEY') or getattr(settings, 'VEO_API_KEY', None)
-        if not api_key:
-            error_msg = "VEO_API_KEY not found in environment variables or settings"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        
-        # Initialize client with API key
-        logger.debug("Initializing Veo client")
-        client = genai.Client(api_key=api_key)
-        return client
+        with _client_lock:
+            if _client is not None:
+                return _client
+            
+            api_key = os.getenv('VEO_API_KEY') or getattr(settings, 'VEO_API_KEY', None)
+            if not api_key:
+                error_msg = "VEO_API_KEY not found in environment variables or settings"
+                logger.error(error_msg)
+                raise ValueError(error_msg)
+            
+            # Initialize client with API key
+            # VEO_API_BASE_URL points the client at another endpoint (e.g. a local fake Veo server)
+            base_url = os.getenv('VEO_API_BASE_URL') or getattr(settings, 'VEO_API_BASE_URL', None)
+            logger.debug(f"Initializing Veo client (base_url: {base_url or 'default'})")
+            if base_url:
+                _client = genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=base_url))
+            else:
+                _client = genai.Client(api_key=api_key)
+            return _client
     
     except Exception as e:
         logger.error(f"Error initializing Veo client: {str(e)}", exc_info=True)
         raise
 
 
-def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str = "16:9", resolution: str = "720p", **kwargs) -> dict:
+def reset_client():
+    """Drop cached Veo client (gọi trong child process sau khi fork)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def _retry_after_header(response):
+    """Seconds từ Retry-After header (delta-seconds hoặc HTTP date), None nếu không có"""
+    headers = getattr(response, 'headers', None)
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay_detail(details):
+    """Seconds từ google.rpc.RetryInfo trong error details (retryDelay: "30s"), None nếu không có"""
+    error = details.get('error', details) if isinstance(details, dict) else {}
+    for detail in error.get('details') or []:
+        if isinstance(detail, dict) and detail.get('retryDelay'):
+            match = RETRY_DELAY_PATTERN.match(str(detail['retryDelay']))
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def classify_error(error: Exception) -> VeoAPIError:
+    """
+    Phân loại exception khi submit lên Veo: rate limit, transient (network / 5xx), invalid prompt hoặc auth
+    
+    Args:
+        error: Exception từ generate_video() (hoặc bất kỳ exception nào trong lúc submit)
+    
+    Returns:
+        VeoAPIError với category và retry_after (server retry hint, nếu có)
+    """
+    if isinstance(error, VeoAPIError):
+        return error
+    if isinstance(error, ValueError):
+        return VeoAPIError(str(error), INVALID_PROMPT)
+    
+    if isinstance(error, errors.APIError):
+        retry_after = _retry_after_header(error.response)
+        if retry_after is None:
+            retry_after = _retry_delay_detail(error.details)
+        code = error.code or 0
+        status = error.status or ''
+        if code == 429 or status == 'RESOURCE_EXHAUSTED':
+            category = RATE_LIMIT
+        elif code in (401, 403) or status in AUTH_STATUSES:
+            category = AUTH
+        elif code >= 500 or code == 408 or status in TRANSIENT_STATUSES:
+            category = TRANSIENT
+        elif 400 <= code < 500:
+            # Bad request, blocked by safety filters, unknown model...: same request fails again
+            category = INVALID_PROMPT
+        else:
+            category = TRANSIENT
+        return VeoAPIError(str(error), category, retry_after)
+    
+    # Timeouts, connection errors and anything unexpected are worth another attempt
+    return VeoAPIError(str(error), TRANSIENT)
+
+
+def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str = DEFAULT_ASPECT_RATIO, resolution: str = DEFAULT_RESOLUTION, **kwargs) -> dict:
     """
     Gọi Veo API (veo-3.1-fast-generate-preview) để generate video
     
@@ -43,7 +168,7 @@ def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str =
     
     Raises:
         ValueError: Nếu prompt rỗng hoặc invalid parameters
-        Exception: Nếu có lỗi khi gọi Veo API
+        VeoAPIError: Nếu có lỗi khi gọi Veo API (xem classify_error)
     """
     if not prompt or not prompt.strip():
         error_msg = "Prompt cannot be empty"
@@ -64,7 +189,11 @@ def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str =
     
     try:
         logger.info(f"Generating video with prompt length: {len(prompt)}, aspect_ratio: {aspect_ratio}, resolution: {resolution}")
-        client = get_veo_client()
+        try:
+            client = get_veo_client()
+        except ValueError as e:
+            # Missing API key is a configuration problem, not a bad prompt
+            raise VeoAPIError(str(e), AUTH) from e
         
         # Build config
         config = types.GenerateVideosConfig(
@@ -77,7 +206,7 @@ def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str =
         
         # Generate video
         operation = client.models.generate_videos(
-            model="veo-3.1-fast-generate-preview",
+            model=VEO_MODEL,
             prompt=prompt,
             config=config,
         )
@@ -98,12 +227,31 @@ def generate_video(prompt: str, negative_prompt: str = None, aspect_ratio: str =
             "message": "Video generation started"
         }
     
-    except ValueError:
+    except VeoAPIError:
         raise
     except Exception as e:
+        classified = classify_error(e)
         error_msg = f"Error calling Veo API: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        raise Exception(error_msg) from e
+        logger.error(f"{error_msg} ({classified.category})", exc_info=True)
+        raise VeoAPIError(error_msg, classified.category, classified.retry_after) from e
+
+
+def _extract_video_url(result):
+    """Lấy video URI từ operation result (GenerateVideosResponse hoặc dict)"""
+    if result is None:
+        return None
+    if isinstance(result, dict):
+        generated_videos = result.get('generated_videos') or result.get('generatedVideos') or []
+        if generated_videos:
+            video = generated_videos[0].get('video') or {}
+            return video.get('uri')
+        return result.get('video_uri') or result.get('uri')
+
+    generated_videos = getattr(result, 'generated_videos', None)
+    if generated_videos:
+        video = getattr(generated_videos[0], 'video', None)
+        return getattr(video, 'uri', None)
+    return getattr(result, 'video_uri', None) or getattr(result, 'uri', None)
 
 
 def check_video_status(operation) -> dict:
@@ -111,7 +259,7 @@ def check_video_status(operation) -> dict:
     Check status của video generation operation
     
     Args:
-        operation: Operation object từ generate_video()
+        operation: Operation object từ generate_video() hoặc get_operation()
     
     Returns:
         Dict chứa status, video_url (nếu completed), error (nếu failed)
@@ -128,65 +276,27 @@ def check_video_status(operation) -> dict:
         }
     
     try:
-        # Check if operation is done
-        if hasattr(operation, 'done'):
-            is_done = operation.done()
-            logger.debug(f"Operation done status: {is_done}")
-        else:
-            logger.warning("Operation object does not have 'done' method")
-            is_done = False
+        # google-genai operations expose `done` as an attribute, older SDKs as a method
+        done = getattr(operation, 'done', False)
+        is_done = bool(done() if callable(done) else done)
+        logger.debug(f"Operation done status: {is_done}")
         
-        # Get result if done
-        if is_done:
-            try:
-                result = operation.result()
-                logger.info("Video generation completed, extracting video URL")
-                
-                # Extract video URL from result
-                video_url = None
-                if hasattr(result, 'video_uri'):
-                    video_url = result.video_uri
-                elif hasattr(result, 'uri'):
-                    video_url = result.uri
-                elif isinstance(result, dict):
-                    video_url = result.get('video_uri') or result.get('uri')
-                
-                if video_url:
-                    logger.info(f"Video URL extracted: {video_url}")
-                else:
-                    logger.warning("Video generation completed but no video URL found in result")
-                
-                return {
-                    "status": "completed",
-                    "video_url": video_url,
-                    "progress": 100,
-                    "error": None,
-                    "message": "Video generation completed"
-                }
-            except Exception as result_error:
-                logger.error(f"Error getting result from operation: {str(result_error)}", exc_info=True)
-                return {
-                    "status": "error",
-                    "video_url": None,
-                    "progress": 0,
-                    "error": str(result_error),
-                    "message": f"Error getting result: {str(result_error)}"
-                }
-        else:
-            # Check for errors
-            if hasattr(operation, 'error'):
-                error = operation.error
-                if error:
-                    error_msg = str(error)
-                    logger.error(f"Video generation failed with error: {error_msg}")
-                    return {
-                        "status": "failed",
-                        "video_url": None,
-                        "progress": 0,
-                        "error": error_msg,
-                        "message": "Video generation failed"
-                    }
-            
+        # Check for errors
+        error = getattr(operation, 'error', None)
+        if error:
+            error_msg = error.get('message', str(error)) if isinstance(error, dict) else str(error)
+            error_code = error.get('code') if isinstance(error, dict) else getattr(error, 'code', None)
+            logger.error(f"Video generation failed with error: {error_msg}")
+            return {
+                "status": "failed",
+                "video_url": None,
+                "progress": 0,
+                "error": error_msg,
+                "error_code": error_code,
+                "message": "Video generation failed"
+            }
+        
+        if not is_done:
             logger.debug("Video generation still in progress")
             return {
                 "status": "processing",
@@ -195,6 +305,34 @@ def check_video_status(operation) -> dict:
                 "error": None,
                 "message": "Video generation in progress"
             }
+        
+        # Get result if done
+        result = getattr(operation, 'response', None) or getattr(operation, 'result', None)
+        if callable(result):
+            result = result()
+        logger.info("Video generation completed, extracting video URL")
+        
+        # Extract video URL from result
+        video_url = _extract_video_url(result)
+        if not video_url:
+            error_msg = "Video generation completed but no video URL found in result"
+            logger.warning(error_msg)
+            return {
+                "status": "failed",
+                "video_url": None,
+                "progress": 100,
+                "error": error_msg,
+                "message": error_msg
+            }
+        
+        logger.info(f"Video URL extracted: {video_url}")
+        return {
+            "status": "completed",
+            "video_url": video_url,
+            "progress": 100,
+            "error": None,
+            "message": "Video generation completed"
+        }
     
     except Exception as e:
         error_msg = f"Error checking video status: {str(e)}"
@@ -208,27 +346,103 @@ def check_video_status(operation) -> dict:
         }
 
 
-def wait_for_video_completion(operation, max_wait_time: int = 300, check_interval: int = 5) -> dict:
+def is_permanent_failure(status_result: dict) -> bool:
+    """
+    Operation failed vì chính prompt (invalid argument, bị safety filter, không có video)
+    thay vì lỗi tạm thời của Veo, nên generate lại cùng prompt cũng sẽ failed
+    
+    Args:
+        status_result: Dict từ check_video_status() với status "failed"
+    """
+    return status_result.get('error_code') not in TRANSIENT_OPERATION_CODES
+
+
+def get_operation(operation_name: str, client=None):
+    """
+    Load lại Veo operation từ operation name (không cần operation object gốc)
+    
+    Args:
+        operation_name: Operation name trả về từ generate_video()
+        client: Veo client (optional, dùng khi gọi nhiều lần liên tiếp)
+    
+    Returns:
+        Refreshed operation object
+    """
+    if not operation_name:
+        raise ValueError("Operation name cannot be empty")
+    
+    client = client or get_veo_client()
+    return client.operations.get(types.GenerateVideosOperation(name=operation_name))
+
+
+def check_operation_status(operation_name: str, client=None) -> dict:
+    """
+    Check status của Veo operation theo operation name
+    
+    Args:
+        operation_name: Operation name đã lưu trên VideoGeneration
+        client: Veo client (optional)
+    
+    Returns:
+        Dict giống check_video_status()
+    """
+    try:
+        operation = get_operation(operation_name, client=client)
+    except Exception as e:
+        error_msg = f"Error refreshing operation {operation_name}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return {
+            "status": "error",
+            "video_url": None,
+            "progress": 0,
+            "error": str(e),
+            "message": error_msg
+        }
+    return check_video_status(operation)
+
+
+def wait_for_video_completion(operation, max_wait_time: int = 300, check_interval: int = None) -> dict:
     """
     Poll Veo API cho đến khi video generation hoàn thành
     
+    Lần poll đầu tiên gần median thời gian generate đã quan sát, sau đó backoff
+    exponentially với jitter (xem poll_schedule_service).
+    
     Args:
         operation: Operation object từ generate_video()
         max_wait_time: Maximum time to wait in seconds (default 5 minutes)
-        check_interval: Time between checks in seconds (default 5 seconds)
+        check_interval: Fixed time between checks in seconds (optional, mặc định adaptive)
     
     Returns:
         Final status dict
     """
+    from . import poll_schedule_service
+    
     start_time = time.time()
+    operation_name = getattr(operation, 'name', None)
+    delay = check_interval or poll_schedule_service.first_poll_delay(VEO_MODEL, DEFAULT_RESOLUTION)
+    polls = 0
     
-    while time.time() - start_time < max_wait_time:
-        status_result = check_video_status(operation)
+    while True:
+        remaining = max_wait_time - (time.time() - start_time)
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        
+        if operation_name:
+            status_result = check_operation_status(operation_name)
+        else:
+            status_result = check_video_status(operation)
+        polls += 1
         
         if status_result["status"] in ["completed", "failed", "error"]:
+            if status_result["status"] == "completed":
+                poll_schedule_service.record_durations(
+                    [time.time() - start_time], VEO_MODEL, DEFAULT_RESOLUTION
+                )
             return status_result
         
-        time.sleep(check_interval)
+        delay = check_interval or poll_schedule_service.next_poll_delay(polls)
     
     # Timeout
     return {
@@ -236,4 +450,3 @@ def wait_for_video_completion(operation, max_wait_time: int = 300, check_interva
         "error": "Video generation timeout",
         "message": f"Video generation took longer than {max_wait_time} seconds"
     }
-
@@ -75,7 +75,8 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('gemini-loading').classList.remove('hidden');
         document.getElementById('error-message').classList.add('hidden');
 
-        fetch('/api/gemini/suggest-prompt/', {
+        // Stream the suggestion so text appears as soon as Gemini produces it
+        fetch('/api/gemini/suggest-prompt/stream/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -92,26 +93,88 @@ document.addEventListener('DOMContentLoaded', function() {
                     throw new Error(data.error || `HTTP ${response.status}`);
                 });
             }
-            return response.json();
+            return readSuggestionStream(response, template);
         })
-        .then(data => {
+        .then(suggestedPrompt => {
             document.getElementById('gemini-loading').classList.add('hidden');
-            
-            if (data.error) {
-                showError('error-message', data.error);
-            } else if (data.suggested_prompt) {
-                promptEditor.value = data.suggested_prompt;
+
+            if (suggestedPrompt) {
+                promptEditor.value = suggestedPrompt;
                 showSuccess('Prompt enhanced by Gemini!');
             } else {
+                promptEditor.value = template;
                 showError('error-message', 'No suggestion received from Gemini');
             }
         })
         .catch(error => {
             document.getElementById('gemini-loading').classList.add('hidden');
+            promptEditor.value = template;
             showError('error-message', 'Error getting suggestion: ' + error.message);
         });
     });
 
+    // Read `chunk` / `done` / `error` Server-Sent Events from the suggestion stream
+    function readSuggestionStream(response, originalTemplate) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let streamedText = '';
+        let suggestedPrompt = null;
+
+        function handleEvent(frame) {
+            let eventName = 'message';
+            const dataLines = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trimStart());
+                }
+            });
+            if (dataLines.length === 0) {
+                return;
+            }
+            const data = JSON.parse(dataLines.join('\n'));
+
+            if (eventName === 'chunk') {
+                if (!streamedText) {
+                    document.getElementById('gemini-loading').classList.add('hidden');
+                }
+                streamedText += data.text;
+                promptEditor.value = streamedText;
+                promptEditor.scrollTop = promptEditor.scrollHeight;
+            } else if (eventName === 'done') {
+                suggestedPrompt = data.suggested_prompt;
+            } else if (eventName === 'error') {
+                promptEditor.value = originalTemplate;
+                throw new Error(data.error);
+            }
+        }
+
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (value) {
+                    buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, '\n');
+                    let boundary = buffer.indexOf('\n\n');
+                    while (boundary !== -1) {
+                        handleEvent(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                        boundary = buffer.indexOf('\n\n');
+                    }
+                }
+                if (done) {
+                    if (buffer.trim()) {
+                        handleEvent(buffer);
+                    }
+                    return suggestedPrompt !== null ? suggestedPrompt : streamedText.trim();
+                }
+                return pump();
+            });
+        }
+
+        return pump();
+    }
+
     // Next to videos
     nextToVideosBtn.addEventListener('click', () => {
         // Save prompt first
@@ -10,7 +10,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const projectId = window.projectId || getProjectIdFromURL();
     const totalRows = window.totalRows || 0;
 
-    let statusPollingInterval = null;
+    let statusPollingTimer = null;
+    let statusPollingStopped = false;
 
     // Start generation
     if (startBtn) {
@@ -42,8 +43,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
             startBtn.style.display = 'none';
             
-            // Start polling for status updates
-            startStatusPolling();
+            // Start listening for status updates
+            startLiveUpdates();
             
             // Reload page after a short delay to show new video cards
             setTimeout(() => {
@@ -57,60 +58,142 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    function startStatusPolling() {
-        // Poll every 5 seconds for status updates
-        statusPollingInterval = setInterval(() => {
-            updateVideoStatuses();
-        }, 5000);
+    let eventSource = null;
+
+    function startLiveUpdates() {
+        // Prefer one long-lived Server-Sent Events connection, fall back to polling
+        if (!window.EventSource) {
+            startStatusPolling();
+            return;
+        }
+
+        eventSource = new EventSource(`/api/projects/${projectId}/events`);
+        let opened = false;
+
+        eventSource.addEventListener('open', () => {
+            opened = true;
+        });
+
+        eventSource.addEventListener('status', (event) => {
+            const video = JSON.parse(event.data);
+            const card = document.querySelector(`[data-video-id="${video.video_id}"]`);
+            if (card) {
+                updateVideoCard(card, video.video_id, video);
+            }
+            if (video.counts) {
+                updateProgressText(video.counts.completed, video.counts.total || totalRows);
+            }
+        });
+
+        eventSource.addEventListener('counts', (event) => {
+            const counts = JSON.parse(event.data);
+            updateProgressText(counts.completed, counts.total || totalRows);
+            if (counts.total > 0 && counts.pending + counts.processing === 0) {
+                stopLiveUpdates();
+            }
+        });
+
+        eventSource.addEventListener('error', () => {
+            // Stream not available (e.g. server running without ASGI): poll instead
+            if (!opened) {
+                stopLiveUpdates();
+                startStatusPolling();
+            }
+        });
+    }
+
+    function stopLiveUpdates() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
 
-        // Also update immediately
+    function updateProgressText(completedCount, total) {
+        if (total > 0) {
+            overallProgressFill.value = (completedCount / total) * 100;
+            progressText.textContent = `${completedCount} / ${total} videos generated`;
+        }
+    }
+
+    function startStatusPolling() {
+        statusPollingStopped = false;
         updateVideoStatuses();
     }
 
+    function scheduleStatusPoll(retryAfterSeconds) {
+        if (statusPollingStopped) {
+            return;
+        }
+        // The server hints when the next Veo operation is due, fall back to 5 seconds
+        const delaySeconds = Math.max(retryAfterSeconds || 5, 1);
+        statusPollingTimer = setTimeout(updateVideoStatuses, delaySeconds * 1000);
+    }
+
+    function stopStatusPolling() {
+        statusPollingStopped = true;
+        if (statusPollingTimer) {
+            clearTimeout(statusPollingTimer);
+            statusPollingTimer = null;
+        }
+    }
+
+    // Cursor returned by the server, only videos changed since then are sent back
+    let statusCursor = null;
+
     function updateVideoStatuses() {
-        const videoCards = document.querySelectorAll('.video-card[data-video-id]');
+        // One request per tick for the whole project
+        let url = `/api/projects/${projectId}/statuses`;
+        if (statusCursor) {
+            url += `?since=${encodeURIComponent(statusCursor)}`;
+        }
+
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    console.error('Error checking video statuses', data.error);
+                    scheduleStatusPoll();
+                    return;
+                }
+
+                statusCursor = data.cursor;
+                data.videos.forEach(video => {
+                    const card = document.querySelector(`[data-video-id="${video.video_id}"]`);
+                    if (card && card.getAttribute('data-status') !== video.status) {
+                        updateVideoCard(card, video.video_id, video);
+                    }
+                });
+
+                updateOverallProgress();
+                scheduleStatusPoll(data.retry_after);
+            })
+            .catch(error => {
+                console.error('Error checking video statuses', error);
+                scheduleStatusPoll();
+            });
+    }
+
+    function updateOverallProgress() {
+        const videoCards = document.querySelectorAll('[data-video-id]');
         let completedCount = 0;
-        let processingCount = 0;
+        let inProgressCount = 0;
 
         videoCards.forEach(card => {
-            const videoId = card.getAttribute('data-video-id');
-            const currentStatus = card.getAttribute('data-status');
-
-            // Only poll if video is pending or processing
-            if (currentStatus === 'pending' || currentStatus === 'processing') {
-                fetch(`/api/veo/status/${videoId}/`)
-                    .then(response => response.json())
-                    .then(data => {
-                        updateVideoCard(card, videoId, data);
-                        
-                        // Count statuses
-                        if (data.status === 'completed') {
-                            completedCount++;
-                        } else if (data.status === 'processing') {
-                            processingCount++;
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Error checking status for video', videoId, error);
-                    });
-            } else if (currentStatus === 'completed') {
+            const status = card.getAttribute('data-status');
+            if (status === 'completed') {
                 completedCount++;
+            } else if (status === 'pending' || status === 'processing') {
+                inProgressCount++;
             }
         });
 
-            // Update overall progress
-        if (totalRows > 0) {
-            const progress = (completedCount / totalRows) * 100;
-            overallProgressFill.value = progress;
-            progressText.textContent = `${completedCount} / ${totalRows} videos generated`;
-        }
+        // Update overall progress
+        updateProgressText(completedCount, totalRows);
 
         // Stop polling if all videos are completed or failed
-        if (completedCount + processingCount === 0 || completedCount === totalRows) {
-            if (statusPollingInterval) {
-                clearInterval(statusPollingInterval);
-                statusPollingInterval = null;
-            }
+        if (inProgressCount === 0 || completedCount === totalRows) {
+            stopStatusPolling();
         }
     }
 
@@ -139,8 +222,14 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Update video preview
         const videoPreview = card.querySelector('.aspect-video');
-        if (status === 'completed' && statusData.video_url && videoPreview) {
-            videoPreview.innerHTML = `<video class="w-full h-full rounded-lg" controls><source src="${statusData.video_url}" type="video/mp4"></video>`;
+        // Prefer the local copy, it supports seeking through Range requests
+        const videoSrc = statusData.file_url || statusData.video_url;
+        if (status === 'completed' && videoSrc && videoPreview) {
+            // Repeated updates must not reload a video that is already playing
+            const currentSource = videoPreview.querySelector('source');
+            if (!currentSource || currentSource.getAttribute('src') !== videoSrc) {
+                videoPreview.innerHTML = `<video class="w-full h-full rounded-lg" controls preload="metadata"><source src="${videoSrc}" type="video/mp4"></video>`;
+            }
         } else if (status === 'processing' && videoPreview) {
             videoPreview.innerHTML = `
                 <div class="text-center">
@@ -178,7 +267,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     function getProjectIdFromURL() {
-        const match = window.location.pathname.match(/step3\/(\d+)/);
+        const match = window.location.pathname.match(/step3\/([^/]+)/);
         return match ? match[1] : null;
     }
 
@@ -197,9 +286,9 @@ document.addEventListener('DOMContentLoaded', function() {
         return cookieValue;
     }
 
-    // Auto-start polling if there are videos already
-    if (videosGrid && videosGrid.querySelectorAll('.video-card').length > 0) {
-        startStatusPolling();
+    // Auto-start live updates if there are videos already
+    if (videosGrid && videosGrid.querySelectorAll('[data-video-id]').length > 0) {
+        startLiveUpdates();
     }
 });
 
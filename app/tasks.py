@@ -3,61 +3,374 @@ Celery tasks for video generation
 """
 import os
 import json
+import uuid
+import random
+import socket
 import logging
+import pandas as pd
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
 from django.conf import settings
 from django.core.cache import cache
+from django.urls import reverse
 from bson import ObjectId
-from mongoengine import DoesNotExist
-from .mongodb_models import Project, DataFile, PromptTemplate, VideoGeneration
-from .services import veo_service
+from mongoengine import DoesNotExist, Q
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from .mongodb_models import Project, DataFile, PromptTemplate, VideoGeneration, PromptAsset
+from .services import (
+    veo_service, gemini_service, data_file_service, prompt_template_service,
+    rate_limiter, progress_service, download_service, poll_schedule_service
+)
 
 logger = logging.getLogger(__name__)
 
+# Retry policy per retryable Veo error class:
+# (settings prefix, default base seconds, default max seconds, default max retries)
+RETRY_POLICY_SETTINGS = {
+    veo_service.RATE_LIMIT: ('VEO_RETRY_RATE_LIMIT', 30, 900, 6),
+    veo_service.TRANSIENT: ('VEO_RETRY_TRANSIENT', 10, 300, 4),
+}
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def generate_single_video(self, video_id: str):
+
+def get_project_id(video_gen) -> str:
+    """Project id của VideoGeneration mà không dereference Project document"""
+    project = video_gen._data.get('project')
+    return str(getattr(project, 'id', project))
+
+
+def get_prompt_hash(video_gen) -> str:
+    """Prompt hash của VideoGeneration (tính lại cho records cũ chưa có)"""
+    return video_gen.prompt_hash or prompt_template_service.prompt_hash(
+        video_gen.prompt_used,
+        veo_service.DEFAULT_ASPECT_RATIO,
+        veo_service.DEFAULT_RESOLUTION,
+        veo_service.VEO_MODEL
+    )
+
+
+def claim_prompt_asset(video_gen) -> dict:
     """
-    Generate video for a single VideoGeneration record
+    Lấy (hoặc tạo) PromptAsset cho prompt của video_gen
+    
+    Video đầu tiên claim một prompt hash trở thành leader và gọi Veo; asset failed
+    được leader mới take over.
+    
+    Returns:
+        PromptAsset raw document, `leader == video_gen.id` nếu video_gen phải gọi Veo
+    """
+    collection = PromptAsset._get_collection()
+    asset_hash = get_prompt_hash(video_gen)
+    now = datetime.utcnow()
+    
+    for _ in range(2):
+        try:
+            asset = collection.find_one_and_update(
+                {'prompt_hash': asset_hash},
+                {'$setOnInsert': {
+                    'prompt': prompt_template_service.normalize_prompt(video_gen.prompt_used),
+                    'aspect_ratio': veo_service.DEFAULT_ASPECT_RATIO,
+                    'resolution': veo_service.DEFAULT_RESOLUTION,
+                    'model': veo_service.VEO_MODEL,
+                    'status': 'processing',
+                    'leader': video_gen.id,
+                    'created_at': now,
+                    'updated_at': now,
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # Another worker inserted the same hash concurrently, read its document
+            continue
+    
+    if asset['status'] == 'failed':
+        # Previous generation failed, this video takes over
+        taken = collection.find_one_and_update(
+            {'_id': asset['_id'], 'status': 'failed'},
+            {'$set': {
+                'status': 'processing', 'leader': video_gen.id,
+                'error_message': None, 'permanent_failure': False, 'updated_at': now
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        asset = taken or collection.find_one({'_id': asset['_id']})
+    
+    return asset
+
+
+def link_duplicate_video(video_gen, asset: dict, previous_status: str) -> dict:
+    """
+    Link VideoGeneration tới PromptAsset của video khác thay vì gọi Veo
+    
+    Returns:
+        dict with status and result
+    """
+    video_id = str(video_gen.id)
+    update = {
+        'duplicate_of': asset['leader'],
+        'prompt_hash': asset['prompt_hash'],
+        'error_message': None,
+        'lease_expires_at': None,
+        'updated_at': datetime.utcnow(),
+    }
+    if asset['status'] == 'completed':
+        update.update({
+            'status': 'completed',
+            'video_url': asset.get('video_url'),
+            'video_file_path': asset.get('video_file_path'),
+            'video_file_size': asset.get('video_file_size'),
+            'video_checksum': asset.get('video_checksum'),
+        })
+    else:
+        # Leader still generating, finish_prompt_asset completes this row
+        update['status'] = 'processing'
+    
+    VideoGeneration._get_collection().update_one({'_id': video_gen.id}, {'$set': update})
+    progress_service.publish_status_change(
+        get_project_id(video_gen), video_id, update['status'], previous_status,
+        video_url=update.get('video_url')
+    )
+    logger.info(f"Video {video_id} linked to prompt asset of {asset['leader']} ({asset['status']})")
+    
+    if update['status'] == 'completed':
+        update_project_completion(get_project_id(video_gen))
+    else:
+        # The leader may have finished between the claim and the link above
+        propagate_prompt_asset(asset['prompt_hash'])
+    
+    return {
+        'status': update['status'],
+        'video_id': video_id,
+        'duplicate_of': str(asset['leader']),
+        'message': 'Linked to existing video generation'
+    }
+
+
+def finish_prompt_asset(leader_id, status: str, video_url: str = None, error: str = None, permanent: bool = False):
+    """
+    Ghi kết quả của leader vào PromptAsset và chuyển kết quả cho các rows trùng prompt
+    
+    Args:
+        leader_id: VideoGeneration id của leader
+        status: 'completed' hoặc 'failed'
+        video_url: Video URL khi completed
+        error: Error message khi failed
+        permanent: Lỗi do chính prompt (rows trùng prompt failed theo thay vì được queue lại)
+    """
+    # A video leads at most one processing asset; older assets it led (before its prompt
+    # was re-rendered) are already finished
+    asset = PromptAsset._get_collection().find_one_and_update(
+        {'leader': ObjectId(leader_id), 'status': 'processing'},
+        {'$set': {
+            'status': status,
+            'video_url': video_url,
+            'error_message': error,
+            'permanent_failure': status == 'failed' and permanent,
+            'updated_at': datetime.utcnow(),
+        }},
+        projection={'prompt_hash': 1}
+    )
+    if asset is not None:
+        propagate_prompt_asset(asset['prompt_hash'])
+
+
+def propagate_prompt_asset(asset_hash: str) -> int:
+    """
+    Complete các VideoGeneration đang chờ PromptAsset; nếu leader failed thì fail theo
+    (permanent failure) hoặc re-queue (lỗi tạm thời)
+    
+    Args:
+        asset_hash: prompt_hash của PromptAsset (followers mang cùng prompt_hash)
+    
+    Returns:
+        Số rows được cập nhật
+    """
+    asset = PromptAsset._get_collection().find_one({'prompt_hash': asset_hash})
+    if not asset or asset['status'] == 'processing':
+        return 0
+    
+    followers = list(
+        VideoGeneration.objects(duplicate_of=asset['leader'], prompt_hash=asset_hash, status='processing')
+        .only('id', 'project')
+        .no_dereference()
+    )
+    if not followers:
+        return 0
+    
+    collection = VideoGeneration._get_collection()
+    follower_filter = {'_id': {'$in': [video.id for video in followers]}, 'status': 'processing'}
+    now = datetime.utcnow()
+    
+    if asset['status'] == 'completed':
+        collection.update_many(follower_filter, {'$set': {
+            'status': 'completed',
+            'video_url': asset.get('video_url'),
+            'video_file_path': asset.get('video_file_path'),
+            'video_file_size': asset.get('video_file_size'),
+            'video_checksum': asset.get('video_checksum'),
+            'updated_at': now,
+        }})
+        for video in followers:
+            progress_service.publish_status_change(
+                get_project_id(video), str(video.id), 'completed', 'processing', video_url=asset.get('video_url')
+            )
+        for project_id in {get_project_id(video) for video in followers}:
+            update_project_completion(project_id)
+    elif asset.get('permanent_failure'):
+        # The prompt itself was rejected, generating it again would fail the same way
+        error_message = asset.get('error_message') or 'Video generation failed'
+        collection.update_many(follower_filter, {'$set': {
+            'status': 'failed',
+            'error_message': error_message,
+            'lease_expires_at': None,
+            'updated_at': now,
+        }})
+        for video in followers:
+            progress_service.publish_status_change(
+                get_project_id(video), str(video.id), 'failed', 'processing', error=error_message
+            )
+        for project_id in {get_project_id(video) for video in followers}:
+            update_project_completion(project_id)
+    else:
+        # Leader failed: queue the rows again, the first one to run becomes the new leader
+        collection.update_many(follower_filter, {'$set': {'status': 'pending', 'duplicate_of': None, 'updated_at': now}})
+        for video in followers:
+            progress_service.publish_status_change(get_project_id(video), str(video.id), 'pending', 'processing')
+            generate_single_video.delay(str(video.id))
+    
+    logger.info(f"Propagated prompt asset of {asset['leader']} ({asset['status']}) to {len(followers)} videos")
+    return len(followers)
+
+
+def new_lease_owner() -> str:
+    """Định danh của một lần claim: host, process và token ngẫu nhiên"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+def claim_video_generation(video_id: str, lease_owner: str):
+    """
+    Atomically chuyển VideoGeneration sang processing (find-and-modify)
+    
+    Chỉ claim được rows pending, hoặc rows processing chưa submit lên Veo mà lease
+    đã hết hạn (worker trước bị crash giữa claim và submit). Rows failed chỉ chạy lại
+    sau khi được reset về pending (reset_failed_videos).
+    
+    Returns:
+        VideoGeneration trước khi update (status cũ), None nếu row đã bị worker khác claim
+    """
+    now = datetime.utcnow()
+    lease_seconds = getattr(settings, 'VEO_SUBMIT_LEASE_SECONDS', 300)
+    claimable = (
+        Q(status='pending') |
+        Q(status='processing', veo_job_id=None, lease_expires_at__lt=now)
+    )
+    return VideoGeneration.objects(Q(id=ObjectId(video_id)) & claimable).modify(
+        new=False,
+        set__status='processing',
+        set__lease_owner=lease_owner,
+        set__lease_expires_at=now + timedelta(seconds=lease_seconds),
+        set__next_attempt_at=None,
+        set__updated_at=now
+    )
+
+
+def release_video_claim(video_id: str, lease_owner: str, status: str) -> bool:
+    """Trả row về status trước claim nếu lease vẫn thuộc về lease_owner"""
+    return VideoGeneration.objects(id=ObjectId(video_id), status='processing', lease_owner=lease_owner).update_one(
+        set__status=status,
+        set__lease_owner=None,
+        set__lease_expires_at=None,
+        set__updated_at=datetime.utcnow()
+    )
+
+
+def start_video_generation(video_id: str) -> dict:
+    """
+    Submit một VideoGeneration record lên Veo API
+    
+    Row được claim bằng một atomic conditional update trước khi gọi Veo, nên cùng một
+    message được deliver nhiều lần (hoặc nhiều workers) chỉ submit một lần.
     
     Args:
         video_id: MongoDB ObjectId string of VideoGeneration
     
     Returns:
         dict with status and result
+    
+    Raises:
+        DoesNotExist: Nếu VideoGeneration không tồn tại
+        RateLimited: Nếu chưa lấy được slot Veo (record không bị thay đổi)
+        VeoAPIError: Nếu có lỗi khi gọi Veo API (retryable errors: record được trả về pending)
     """
+    lease_owner = new_lease_owner()
+    video_gen = claim_video_generation(video_id, lease_owner)
+    
+    if video_gen is None:
+        # Already claimed by another worker, processing or completed
+        current = VideoGeneration.objects.only('status').get(id=ObjectId(video_id))
+        logger.info(f"Video {video_id} not claimable, status: {current.status}")
+        return {
+            'status': current.status,
+            'video_id': video_id,
+            'message': f'Video already {current.status}'
+        }
+    
+    previous_status = video_gen.status
+    if previous_status == 'processing':
+        logger.warning(f"Video {video_id} lease of {video_gen.lease_owner} expired before submission, taking over")
+    
     try:
-        # Get video generation record
-        video_gen = VideoGeneration.objects.get(id=ObjectId(video_id))
-        
-        # Check if already processing or completed
-        if video_gen.status in ['processing', 'completed']:
-            logger.info(f"Video {video_id} already in status: {video_gen.status}")
-            return {
-                'status': video_gen.status,
-                'video_id': video_id,
-                'message': f'Video already {video_gen.status}'
-            }
-        
-        # Update status to processing
-        video_gen.status = 'processing'
-        video_gen.save()
-        
-        logger.info(f"Starting video generation for video_id: {video_id}, prompt: {video_gen.prompt_used[:100]}...")
+        # Rows with an identical prompt and parameters share one Veo generation
+        asset = claim_prompt_asset(video_gen)
+        if asset['leader'] != video_gen.id:
+            return link_duplicate_video(video_gen, asset, previous_status)
         
-        # Call Veo API
+        # Coordinate with every other worker before hitting the Veo API
+        retry_after = rate_limiter.acquire_veo_slot(video_id)
+        if retry_after:
+            raise rate_limiter.RateLimited(retry_after)
+    except Exception:
+        release_video_claim(video_id, lease_owner, previous_status)
+        raise
+    
+    progress_service.publish_status_change(get_project_id(video_gen), video_id, 'processing', previous_status)
+    
+    logger.info(f"Starting video generation for video_id: {video_id}, prompt: {video_gen.prompt_used[:100]}...")
+    
+    # Call Veo API
+    try:
         result = veo_service.generate_video(video_gen.prompt_used)
         operation = result.get('operation')
         operation_name = result.get('operation_name')
         
         if not operation:
             raise Exception("Failed to get operation from Veo API")
-        
-        # Store operation in Redis cache (instead of in-memory)
-        cache_key = f'veo_operation:{video_id}'
-        # Store operation name and metadata in cache
+    except Exception as e:
+        rate_limiter.release_veo_slot(video_id)
+        # The row waits for its retry as pending; only permanent errors end up failed
+        if veo_service.classify_error(e).retryable and release_video_claim(video_id, lease_owner, 'pending'):
+            progress_service.publish_status_change(get_project_id(video_gen), video_id, 'pending', 'processing')
+        raise
+    
+    # Record the operation in Mongo (source of truth for the poller);
+    # the lease is no longer needed once Veo has the job
+    submitted_at = datetime.utcnow()
+    recorded = VideoGeneration.objects(id=video_gen.id, lease_owner=lease_owner).update_one(
+        set__veo_job_id=operation_name or str(video_id),
+        set__submitted_at=submitted_at,
+        set__poll_count=0,
+        set__next_poll_at=first_poll_time(submitted_at),
+        set__lease_expires_at=None,
+        set__updated_at=submitted_at
+    )
+    
+    # Redis copy is only an accelerator, losing it does not lose the job
+    try:
         cache.set(
-            cache_key,
+            f'veo_operation:{video_id}',
             {
                 'operation_name': operation_name,
                 'status': 'processing',
@@ -65,18 +378,137 @@ def generate_single_video(self, video_id: str):
             },
             timeout=3600 * 24  # 24 hours
         )
-        
-        # Update video generation record
-        video_gen.veo_job_id = operation_name or str(video_id)
-        video_gen.save()
-        
-        logger.info(f"Video generation started for {video_id}, operation: {operation_name}")
-        
+    except Exception as e:
+        logger.warning(f"Could not cache operation of video {video_id}: {str(e)}")
+    if not recorded:
+        logger.warning(f"Lease on video {video_id} was lost during submission, operation {operation_name} not recorded")
+    
+    logger.info(f"Video generation started for {video_id}, operation: {operation_name}")
+    
+    return {
+        'status': 'processing',
+        'video_id': video_id,
+        'operation_name': operation_name,
+        'message': 'Video generation started'
+    }
+
+
+def mark_video_failed(video_id: str, error: Exception):
+    """Update VideoGeneration status to failed với error message"""
+    try:
+        # Never overwrite a result the poller recorded concurrently
+        video_gen = VideoGeneration.objects(id=ObjectId(video_id), status__ne='completed').modify(
+            new=False,
+            set__status='failed',
+            set__error_message=str(error),
+            set__lease_expires_at=None,
+            set__updated_at=datetime.utcnow()
+        )
+        if video_gen is None:
+            return
+        progress_service.publish_status_change(
+            get_project_id(video_gen), video_id, 'failed', video_gen.status, error=str(error)
+        )
+        # Rows waiting on this video fail with it when the prompt itself was rejected,
+        # otherwise they are queued again
+        finish_prompt_asset(
+            video_gen.id, 'failed', error=str(error),
+            permanent=not veo_service.classify_error(error).retryable
+        )
+        # The last outstanding row of a project may fail here, outside any batch task
+        update_project_completion(get_project_id(video_gen))
+    except Exception as save_error:
+        logger.error(f"Error marking video {video_id} as failed: {str(save_error)}")
+
+
+def retry_countdown(error, attempt: int):
+    """
+    Seconds đến lần retry tiếp theo của một Veo submission bị lỗi
+    
+    Exponential backoff theo error class với jitter (tránh tất cả rows retry cùng lúc
+    sau một Veo outage); server retry hint được ưu tiên nếu dài hơn.
+    
+    Args:
+        error: VeoAPIError (từ veo_service.classify_error)
+        attempt: Số lần đã retry (submit_attempts - 1, xem record_submit_failure)
+    
+    Returns:
+        Countdown in seconds, None nếu không retry (permanent error hoặc hết retries)
+    """
+    if error.category not in RETRY_POLICY_SETTINGS:
+        return None
+    prefix, default_base, default_cap, default_max_retries = RETRY_POLICY_SETTINGS[error.category]
+    if attempt >= int(getattr(settings, f'{prefix}_MAX_RETRIES', default_max_retries)):
+        return None
+    
+    base = float(getattr(settings, f'{prefix}_BASE_SECONDS', default_base))
+    cap = float(getattr(settings, f'{prefix}_MAX_SECONDS', default_cap))
+    backoff = min(cap, base * 2 ** min(attempt, 16))
+    countdown = random.uniform(backoff / 2, backoff)
+    if error.retry_after:
+        countdown = max(countdown, error.retry_after + random.uniform(0, base))
+    return countdown
+
+
+def record_submit_failure(video_id: str, error: Exception) -> int:
+    """
+    Đếm một lần submit lỗi (retryable) trên VideoGeneration
+    
+    Số lần được lưu trên document thay vì Celery retries, nên reschedule (RateLimited,
+    chunk hand-off, requeue) không reset retry budget.
+    
+    Returns:
+        submit_attempts sau khi tăng
+    """
+    video_gen = VideoGeneration.objects(id=ObjectId(video_id)).modify(
+        new=True,
+        inc__submit_attempts=1,
+        set__error_message=str(error),
+        set__updated_at=datetime.utcnow()
+    )
+    return video_gen.submit_attempts if video_gen else 1
+
+
+def schedule_next_attempt(video_ids: list, countdown: float):
+    """
+    Lưu thời điểm message retry / reschedule của các rows pending sẽ chạy
+    
+    batch_generate_videos không queue lại rows đang chờ message này; nếu message bị mất
+    thì row được queue lại ở lần chạy sau khi next_attempt_at đã qua.
+    """
+    VideoGeneration.objects(id__in=[ObjectId(video_id) for video_id in video_ids], status='pending').update(
+        set__next_attempt_at=datetime.utcnow() + timedelta(seconds=countdown)
+    )
+
+
+@shared_task(bind=True, max_retries=None)
+def generate_single_video(self, video_id: str):
+    """
+    Generate video for a single VideoGeneration record
+    
+    Lỗi được phân loại (veo_service.classify_error): rate limit và transient errors
+    được retry theo retry_countdown, invalid prompt và auth errors mark failed ngay.
+    
+    Args:
+        video_id: MongoDB ObjectId string of VideoGeneration
+    
+    Returns:
+        dict with status and result
+    """
+    try:
+        # Rows normally get enriched with their chunk, this covers rows queued on their own
+        enrich_prompts_if_enabled([video_id])
+        return start_video_generation(video_id)
+    
+    except rate_limiter.RateLimited as e:
+        # Not a failure: come back once a slot is expected to be free
+        schedule_next_attempt([video_id], e.retry_after)
+        generate_single_video.apply_async((video_id,), countdown=e.retry_after)
+        logger.info(f"Video {video_id} throttled, rescheduled in {e.retry_after:.1f}s")
         return {
-            'status': 'processing',
+            'status': 'throttled',
             'video_id': video_id,
-            'operation_name': operation_name,
-            'message': 'Video generation started'
+            'retry_after': e.retry_after
         }
     
     except DoesNotExist:
@@ -89,30 +521,238 @@ def generate_single_video(self, video_id: str):
         }
     
     except Exception as e:
+        error = veo_service.classify_error(e)
         error_msg = f"Error generating video {video_id}: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        
-        # Update video generation status to failed
-        try:
-            video_gen = VideoGeneration.objects.get(id=ObjectId(video_id))
-            video_gen.status = 'failed'
-            video_gen.error_message = str(e)
-            video_gen.save()
-        except:
-            pass
         
-        # Retry if not exceeded max retries
-        if self.request.retries < self.max_retries:
-            logger.info(f"Retrying video generation for {video_id}, attempt {self.request.retries + 1}")
-            raise self.retry(exc=e)
+        attempts = record_submit_failure(video_id, e) if error.retryable else 0
+        countdown = retry_countdown(error, attempts - 1)
+        if countdown is not None:
+            logger.warning(f"{error_msg} ({error.category}), retry {attempts} in {countdown:.1f}s")
+            schedule_next_attempt([video_id], countdown)
+            raise self.retry(exc=e, countdown=countdown)
         
+        # Permanent error or out of retries
+        if error.retryable:
+            logger.error(f"{error_msg} ({error.category}), giving up after {attempts - 1} retries", exc_info=True)
+        else:
+            logger.error(f"{error_msg} ({error.category}), not retried", exc_info=True)
+        mark_video_failed(video_id, e)
         return {
             'status': 'failed',
             'video_id': video_id,
-            'error': error_msg
+            'error': error_msg,
+            'error_category': error.category
         }
 
 
+@shared_task
+def generate_video_chunk(video_ids: list):
+    """
+    Generate videos cho một chunk VideoGeneration records trong một Celery message
+    
+    Rows bị lỗi retryable được chuyển cho generate_single_video để retry riêng từng row,
+    permanent errors được mark failed ngay.
+    
+    Args:
+        video_ids: List of MongoDB ObjectId strings of VideoGeneration
+    
+    Returns:
+        dict with per-chunk counts
+    """
+    started = 0
+    retried = 0
+    failed = 0
+    missing = 0
+    throttled = 0
+    
+    enrich_prompts_if_enabled(video_ids)
+    
+    for position, video_id in enumerate(video_ids):
+        try:
+            result = start_video_generation(video_id)
+            if result.get('status') == 'processing':
+                started += 1
+        
+        except rate_limiter.RateLimited as e:
+            # Reschedule the rest of the chunk as a single message
+            remaining = video_ids[position:]
+            schedule_next_attempt(remaining, e.retry_after)
+            generate_video_chunk.apply_async((remaining,), countdown=e.retry_after)
+            logger.info(f"Chunk throttled, rescheduled {len(remaining)} videos in {e.retry_after:.1f}s")
+            throttled = len(remaining)
+            break
+        
+        except DoesNotExist:
+            logger.error(f"VideoGeneration with id {video_id} not found")
+            missing += 1
+        
+        except Exception as e:
+            error = veo_service.classify_error(e)
+            attempts = record_submit_failure(video_id, e) if error.retryable else 0
+            countdown = retry_countdown(error, attempts - 1)
+            if countdown is None:
+                logger.error(f"Error generating video {video_id} ({error.category}): {str(e)}", exc_info=True)
+                mark_video_failed(video_id, e)
+                failed += 1
+                continue
+            
+            # Hand the row over to generate_single_video, the attempt just made counts against its budget
+            logger.warning(f"Error generating video {video_id} ({error.category}), retry in {countdown:.1f}s: {str(e)}")
+            schedule_next_attempt([video_id], countdown)
+            generate_single_video.apply_async((video_id,), countdown=countdown)
+            retried += 1
+            
+            if error.category == veo_service.RATE_LIMIT and position + 1 < len(video_ids):
+                # Veo is throttling us: the rest of the chunk would hit the same limit
+                remaining = video_ids[position + 1:]
+                chunk_countdown = retry_countdown(error, 0)
+                schedule_next_attempt(remaining, chunk_countdown)
+                generate_video_chunk.apply_async((remaining,), countdown=chunk_countdown)
+                logger.info(f"Veo rate limit, rescheduled {len(remaining)} videos of the chunk")
+                throttled = len(remaining)
+                break
+    
+    return {
+        'video_count': len(video_ids),
+        'started': started,
+        'retried': retried,
+        'failed': failed,
+        'missing': missing,
+        'throttled': throttled
+    }
+
+
+def update_project_completion(project_id: str) -> bool:
+    """
+    Mark project completed khi không còn video pending/processing
+    
+    Returns:
+        True nếu project đã completed
+    """
+    project_object_id = ObjectId(project_id)
+    in_progress = VideoGeneration.objects(
+        project=project_object_id,
+        status__in=['pending', 'processing']
+    ).count()
+    
+    if in_progress:
+        return False
+    
+    # Rows of the first batches may all finish before batch_generate_videos read the whole file
+    completed = Project.objects(
+        id=project_object_id, status='generating', generation_queueing__ne=True
+    ).update_one(set__status='completed')
+    if not completed:
+        return False
+    logger.info(f"Project {project_id} completed")
+    return True
+
+
+def first_poll_time(submitted_at: datetime) -> datetime:
+    """Thời điểm poll đầu tiên của một Veo operation vừa submit (gần median thời gian generate)"""
+    delay = poll_schedule_service.first_poll_delay(veo_service.VEO_MODEL, veo_service.DEFAULT_RESOLUTION)
+    return submitted_at + timedelta(seconds=delay)
+
+
+def next_poll_time(video, now: datetime) -> datetime:
+    """Thời điểm poll tiếp theo của một Veo operation vẫn đang chạy (exponential backoff)"""
+    return now + timedelta(seconds=poll_schedule_service.next_poll_delay((video.poll_count or 0) + 1))
+
+
+def refresh_video_operations(videos: list) -> dict:
+    """
+    Refresh Veo operations của các VideoGeneration đang processing và ghi kết quả bằng một bulk write
+    
+    Args:
+        videos: List of VideoGeneration documents (cần id, project, veo_job_id)
+    
+    Returns:
+        dict with counts per resulting status
+    """
+    summary = {'polled': len(videos), 'completed': 0, 'failed': 0, 'processing': 0, 'error': 0}
+    if not videos:
+        return summary
+    
+    client = veo_service.get_veo_client()
+    concurrency = getattr(settings, 'VEO_POLL_CONCURRENCY', 8)
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(videos))) as executor:
+        results = list(executor.map(
+            lambda video: veo_service.check_operation_status(video.veo_job_id, client=client),
+            videos
+        ))
+    
+    now = datetime.utcnow()
+    operations = []
+    finished_projects = set()
+    for video, result in zip(videos, results):
+        status = result.get('status')
+        update = {'last_polled_at': now, 'next_poll_at': None}
+        
+        if status == 'completed':
+            update.update({
+                'status': 'completed',
+                'video_url': result.get('video_url'),
+                'error_message': None,
+                'updated_at': now
+            })
+        elif status == 'failed':
+            update.update({
+                'status': 'failed',
+                'error_message': result.get('error') or 'Video generation failed',
+                'updated_at': now
+            })
+        else:
+            if status != 'processing':
+                # Could not reach Veo this time, try again on the next sweep
+                status = 'error'
+            update['next_poll_at'] = next_poll_time(video, now)
+        
+        summary[status] += 1
+        if status in ('completed', 'failed'):
+            finished_projects.add(get_project_id(video))
+        
+        # Only touch rows still processing so concurrent transitions are not overwritten
+        operations.append(UpdateOne(
+            {'_id': video.id, 'status': 'processing'},
+            {'$set': update, '$inc': {'poll_count': 1}}
+        ))
+    
+    VideoGeneration._get_collection().bulk_write(operations, ordered=False)
+    
+    # Learn how long generations take so first polls land close to completion
+    poll_schedule_service.record_durations(
+        [
+            (now - video.submitted_at).total_seconds()
+            for video, result in zip(videos, results)
+            if result.get('status') == 'completed' and video.submitted_at
+        ],
+        veo_service.VEO_MODEL,
+        veo_service.DEFAULT_RESOLUTION
+    )
+    
+    for video, result in zip(videos, results):
+        if result.get('status') in ('completed', 'failed'):
+            rate_limiter.release_veo_slot(str(video.id))
+            progress_service.publish_status_change(
+                get_project_id(video), str(video.id), result['status'], 'processing',
+                video_url=result.get('video_url'), error=result.get('error')
+            )
+            finish_prompt_asset(
+                video.id, result['status'], result.get('video_url'), error=result.get('error'),
+                permanent=result['status'] == 'failed' and veo_service.is_permanent_failure(result)
+            )
+    
+    for project_id in finished_projects:
+        update_project_completion(project_id)
+    
+    # Fetch local copies before the remote URLs expire
+    completed_ids = [str(video.id) for video, result in zip(videos, results) if result.get('status') == 'completed']
+    if completed_ids:
+        download_completed_videos.delay(completed_ids)
+    
+    return summary
+
+
 @shared_task
 def check_video_status_task(video_id: str):
     """
@@ -127,25 +767,18 @@ def check_video_status_task(video_id: str):
     try:
         video_gen = VideoGeneration.objects.get(id=ObjectId(video_id))
         
-        # Get operation from Redis cache
-        cache_key = f'veo_operation:{video_id}'
-        operation_data = cache.get(cache_key)
-        
-        if not operation_data:
-            logger.warning(f"No operation found in cache for video {video_id}")
+        if video_gen.status != 'processing':
             return {
                 'status': video_gen.status,
                 'video_id': video_id,
-                'message': 'No operation found. Video may not have started yet.'
+                'message': f'Video is {video_gen.status}'
             }
         
-        # Reconstruct operation (in production, you might need to store more info)
-        # For now, we'll use the veo_service to check status
-        # Note: This is a simplified version - in production you'd store the full operation object
-        
-        # Since we can't easily reconstruct the operation object,
-        # we'll use a different approach: store operation_name and check via API
-        operation_name = operation_data.get('operation_name')
+        # Operation name is stored on the record, the Redis cache entry may have expired
+        operation_name = video_gen.veo_job_id
+        if not operation_name:
+            operation_data = cache.get(f'veo_operation:{video_id}') or {}
+            operation_name = operation_data.get('operation_name')
         
         if not operation_name:
             return {
@@ -154,14 +787,46 @@ def check_video_status_task(video_id: str):
                 'message': 'Operation name not found'
             }
         
-        # For now, we'll need to modify veo_service to support checking by operation name
-        # Or we can implement a polling mechanism
-        # This is a placeholder - you may need to adjust based on Veo API capabilities
+        # Follow the adaptive poll schedule, Veo is not asked again before the next poll is due
+        if video_gen.next_poll_at and video_gen.next_poll_at > datetime.utcnow():
+            return {
+                'status': video_gen.status,
+                'video_id': video_id,
+                'operation_name': operation_name,
+                'next_poll_at': video_gen.next_poll_at.isoformat(),
+                'message': 'Next status check not due yet'
+            }
+        
+        # Another check for this video is already running, share its result
+        lock_key = f'veo_status_lock:{video_id}'
+        if not cache.add(lock_key, 1, timeout=60):
+            return {
+                'status': video_gen.status,
+                'video_id': video_id,
+                'operation_name': operation_name,
+                'message': 'Status check already in progress'
+            }
         
-        logger.info(f"Checking status for video {video_id}, operation: {operation_name}")
+        try:
+            logger.info(f"Checking status for video {video_id}, operation: {operation_name}")
+            video_gen.veo_job_id = operation_name
+            refresh_video_operations([video_gen])
+            video_gen.reload()
+        finally:
+            cache.delete(lock_key)
+        
+        # Serve this result to status requests until the next refresh is allowed
+        cached_status = {'status': video_gen.status, 'video_id': video_id}
+        if video_gen.video_url:
+            cached_status['video_url'] = video_gen.video_url
+        if video_gen.error_message:
+            cached_status['error'] = video_gen.error_message
+        cache.set(
+            f'veo_status:{video_id}',
+            cached_status,
+            timeout=getattr(settings, 'VEO_STATUS_MIN_REFRESH_SECONDS', 10)
+        )
         
-        # Update status based on current state
-        # In a real implementation, you'd call Veo API to check the actual status
         return {
             'status': video_gen.status,
             'video_id': video_id,
@@ -185,11 +850,613 @@ def check_video_status_task(video_id: str):
         }
 
 
+@shared_task
+def poll_veo_operations():
+    """
+    Celery beat task: refresh các Veo operations đến hạn poll (next_poll_at <= now)
+    
+    Operations được đọc từ Mongo bằng một query trên index (status, next_poll_at),
+    Redis chỉ được dùng cho lock (chạy tiếp không có lock nếu Redis lỗi).
+    
+    Returns:
+        dict with counts per resulting status
+    """
+    lock_key = 'veo_poll_lock'
+    lock_timeout = getattr(settings, 'VEO_POLL_INTERVAL_SECONDS', 15) * 4
+    try:
+        locked = cache.add(lock_key, 1, timeout=lock_timeout)
+    except Exception as e:
+        # Poll updates are conditional and idempotent, an overlapping sweep is harmless
+        logger.warning(f"Veo poll lock unavailable, polling without it: {str(e)}")
+        locked = None
+    if locked is False:
+        logger.info("Previous Veo poll sweep still running, skipping")
+        return {'skipped': True}
+    
+    try:
+        now = datetime.utcnow()
+        batch_size = getattr(settings, 'VEO_POLL_BATCH_SIZE', 200)
+        # Rows submitted before next_poll_at existed are due immediately
+        due = Q(next_poll_at__lte=now) | Q(next_poll_at=None, veo_job_id__ne=None)
+        videos = list(
+            VideoGeneration.objects(Q(status='processing') & due)
+            .only('id', 'project', 'veo_job_id', 'submitted_at', 'poll_count')
+            .no_dereference()
+            .order_by('next_poll_at')
+            .limit(batch_size)
+        )
+        summary = refresh_video_operations(videos)
+        if videos:
+            logger.info(f"Veo poll sweep: {summary}")
+        return summary
+    
+    except Exception as e:
+        logger.error(f"Error polling Veo operations: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+    
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def download_video_file(video) -> dict:
+    """
+    Download video của một VideoGeneration về MEDIA_ROOT/videos/, bỏ qua nếu worker khác đang tải
+    
+    Returns:
+        Download result dict, None nếu bị bỏ qua
+    """
+    video_id = str(video.id)
+    lock_key = f'video_download_lock:{video_id}'
+    if not cache.add(lock_key, 1, timeout=getattr(settings, 'CELERY_TASK_TIME_LIMIT', 1800)):
+        return None
+    try:
+        relative_path = download_service.video_file_path(get_project_id(video), video_id)
+        return download_service.download_video(video.video_url, relative_path)
+    finally:
+        cache.delete(lock_key)
+
+
+def next_download_time(attempts: int, now: datetime) -> datetime:
+    """Lần download tiếp theo sau attempts lần lỗi: exponential backoff với jitter"""
+    base = float(getattr(settings, 'VIDEO_DOWNLOAD_RETRY_BASE_SECONDS', 60))
+    cap = float(getattr(settings, 'VIDEO_DOWNLOAD_RETRY_MAX_SECONDS', 3600))
+    backoff = min(cap, base * 2 ** min(max(attempts - 1, 0), 16))
+    return now + timedelta(seconds=random.uniform(backoff / 2, backoff))
+
+
+@shared_task
+def download_completed_videos(video_ids: list = None):
+    """
+    Download completed videos về local storage với bounded concurrency
+    
+    Không có video_ids thì chạy như beat sweep: lấy các completed videos chưa có local copy
+    đã đến hạn download. Download lỗi được ghi lại (download_attempts, download_error) và
+    retry với backoff (file .part được resume), bỏ qua sau VIDEO_DOWNLOAD_MAX_ATTEMPTS lần.
+    
+    Args:
+        video_ids: List of MongoDB ObjectId strings of VideoGeneration (optional)
+    
+    Returns:
+        dict with download counts
+    """
+    sweep_lock = 'video_download_sweep_lock'
+    if video_ids is None and not cache.add(sweep_lock, 1, timeout=getattr(settings, 'CELERY_TASK_TIME_LIMIT', 1800)):
+        logger.info("Previous video download sweep still running, skipping")
+        return {'skipped': True}
+    
+    try:
+        # Rows linked to another video's prompt asset share its file
+        queryset = VideoGeneration.objects(
+            status='completed', video_file_path=None, video_url__ne=None, duplicate_of=None
+        )
+        if video_ids is not None:
+            queryset = queryset.filter(id__in=[ObjectId(video_id) for video_id in video_ids])
+        else:
+            # Never-tried rows (next_download_at None) sort first, then the longest overdue retries
+            max_attempts = getattr(settings, 'VIDEO_DOWNLOAD_MAX_ATTEMPTS', 6)
+            queryset = queryset.filter(
+                (Q(download_attempts__lt=max_attempts) | Q(download_attempts=None)) &
+                (Q(next_download_at=None) | Q(next_download_at__lte=datetime.utcnow()))
+            ).order_by('next_download_at').limit(getattr(settings, 'VIDEO_DOWNLOAD_BATCH_SIZE', 100))
+        videos = list(queryset.only('id', 'project', 'video_url', 'download_attempts').no_dereference())
+        
+        summary = {'downloaded': 0, 'failed': 0, 'skipped': 0}
+        if not videos:
+            return summary
+        
+        def run(video):
+            try:
+                return download_video_file(video)
+            except Exception as e:
+                logger.error(f"Error downloading video {video.id}: {str(e)}")
+                return e
+        
+        concurrency = getattr(settings, 'VIDEO_DOWNLOAD_CONCURRENCY', 4)
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(videos))) as executor:
+            results = list(executor.map(run, videos))
+        
+        operations = []
+        for video, result in zip(videos, results):
+            if result is None:
+                summary['skipped'] += 1
+            elif isinstance(result, Exception):
+                summary['failed'] += 1
+                now = datetime.utcnow()
+                attempts = (video.download_attempts or 0) + 1
+                if attempts >= getattr(settings, 'VIDEO_DOWNLOAD_MAX_ATTEMPTS', 6):
+                    logger.warning(f"Giving up downloading video {video.id} after {attempts} attempts: {str(result)}")
+                operations.append(UpdateOne(
+                    {'_id': video.id},
+                    {'$set': {
+                        'download_attempts': attempts,
+                        'download_error': str(result),
+                        'next_download_at': next_download_time(attempts, now),
+                        'updated_at': now,
+                    }}
+                ))
+            else:
+                summary['downloaded'] += 1
+                operations.append(UpdateOne(
+                    {'_id': video.id},
+                    {'$set': {
+                        'video_file_path': result['file_path'],
+                        'video_file_size': result['size'],
+                        'video_checksum': result['md5'],
+                        'download_error': None,
+                        'next_download_at': None,
+                        'updated_at': datetime.utcnow(),
+                    }}
+                ))
+        
+        downloaded = {video.id: result for video, result in zip(videos, results) if isinstance(result, dict)}
+        if downloaded:
+            # Rows linked to the downloaded videos share the same file
+            followers = list(
+                VideoGeneration.objects(duplicate_of__in=list(downloaded), status='completed', video_file_path=None)
+                .only('id', 'project', 'duplicate_of', 'video_url')
+                .no_dereference()
+            )
+            asset_operations = []
+            for leader_id, result in downloaded.items():
+                file_fields = {
+                    'video_file_path': result['file_path'],
+                    'video_file_size': result['size'],
+                    'video_checksum': result['md5'],
+                }
+                # The completed asset: the same video may also have led older, failed assets
+                asset_operations.append(UpdateOne({'leader': leader_id, 'status': 'completed'}, {'$set': file_fields}))
+            for video in followers:
+                result = downloaded[video.duplicate_of]
+                operations.append(UpdateOne(
+                    {'_id': video.id},
+                    {'$set': {
+                        'video_file_path': result['file_path'],
+                        'video_file_size': result['size'],
+                        'video_checksum': result['md5'],
+                        'updated_at': datetime.utcnow(),
+                    }}
+                ))
+            PromptAsset._get_collection().bulk_write(asset_operations, ordered=False)
+        else:
+            followers = []
+        
+        if operations:
+            VideoGeneration._get_collection().bulk_write(operations, ordered=False)
+        
+        # Let open step 3 pages switch to the local copy
+        for video in [video for video in videos if video.id in downloaded] + followers:
+            progress_service.publish_status_change(
+                get_project_id(video), str(video.id), 'completed', 'completed',
+                video_url=video.video_url, file_url=reverse('serve_video', args=[str(video.id)])
+            )
+        
+        logger.info(f"Video download: {summary}")
+        return summary
+    
+    except Exception as e:
+        logger.error(f"Error downloading completed videos: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+    
+    finally:
+        if video_ids is None:
+            cache.delete(sweep_lock)
+
+
+def requeue_stale_videos(videos: list) -> int:
+    """
+    Đưa các rows processing chưa submit lên Veo (claim bị mất) về pending và queue lại
+    
+    Returns:
+        Số rows được queue lại
+    """
+    if not videos:
+        return 0
+    
+    now = datetime.utcnow()
+    operations = [
+        # updated_at guard: skip rows a worker claimed since the sweep query
+        UpdateOne(
+            {'_id': video.id, 'status': 'processing', 'veo_job_id': None, 'updated_at': video.updated_at},
+            {'$set': {'status': 'pending', 'lease_owner': None, 'lease_expires_at': None, 'updated_at': now}}
+        )
+        for video in videos
+    ]
+    VideoGeneration._get_collection().bulk_write(operations, ordered=False)
+    
+    # Queueing a row that was already pending again is harmless, the claim is atomic
+    requeued = VideoGeneration.objects(
+        id__in=[video.id for video in videos], status='pending'
+    ).only('id', 'project').no_dereference()
+    count = 0
+    for video in requeued:
+        progress_service.publish_status_change(get_project_id(video), str(video.id), 'pending', 'processing')
+        generate_single_video.delay(str(video.id))
+        count += 1
+    return count
+
+
+def fail_stale_videos(videos: list, error_message: str) -> int:
+    """
+    Mark failed các rows có Veo operation chạy quá lâu
+    
+    Returns:
+        Số rows được mark failed
+    """
+    if not videos:
+        return 0
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {'_id': video.id, 'status': 'processing', 'veo_job_id': video.veo_job_id},
+            {'$set': {'status': 'failed', 'error_message': error_message, 'lease_expires_at': None, 'updated_at': now}}
+        )
+        for video in videos
+    ]
+    VideoGeneration._get_collection().bulk_write(operations, ordered=False)
+    
+    failed = list(
+        VideoGeneration.objects(id__in=[video.id for video in videos], status='failed', error_message=error_message)
+        .only('id', 'project').no_dereference()
+    )
+    for video in failed:
+        rate_limiter.release_veo_slot(str(video.id))
+        progress_service.publish_status_change(
+            get_project_id(video), str(video.id), 'failed', 'processing', error=error_message
+        )
+        finish_prompt_asset(video.id, 'failed')
+    for project_id in {get_project_id(video) for video in failed}:
+        update_project_completion(project_id)
+    return len(failed)
+
+
+@shared_task
+def reap_stale_videos():
+    """
+    Celery beat task: xử lý các VideoGeneration bị kẹt ở processing
+    
+    - Chưa submit lên Veo (worker crash, lease hết hạn): lấy lại operation name từ
+      Redis cache nếu còn, nếu không thì queue lại
+    - Veo operation quá STALE_VIDEO_OPERATION_SECONDS: mark failed
+    - Rows chờ prompt asset của video khác: đồng bộ lại với kết quả của leader
+    
+    Returns:
+        dict with counts per action
+    """
+    lock_key = 'video_reaper_lock'
+    if not cache.add(lock_key, 1, timeout=getattr(settings, 'STALE_VIDEO_SWEEP_INTERVAL_SECONDS', 300)):
+        logger.info("Previous stale video sweep still running, skipping")
+        return {'skipped': True}
+    
+    try:
+        now = datetime.utcnow()
+        submit_timeout = getattr(settings, 'STALE_VIDEO_SUBMIT_SECONDS', 600)
+        operation_timeout = getattr(settings, 'STALE_VIDEO_OPERATION_SECONDS', 3600)
+        
+        # (status, updated_at) index: oldest processing rows first
+        videos = list(
+            VideoGeneration.objects(
+                status='processing',
+                updated_at__lt=now - timedelta(seconds=min(submit_timeout, operation_timeout))
+            )
+            .only('id', 'project', 'veo_job_id', 'lease_expires_at', 'duplicate_of', 'prompt_hash', 'submitted_at', 'updated_at')
+            .no_dereference()
+            .order_by('updated_at')
+            .limit(getattr(settings, 'STALE_VIDEO_SWEEP_LIMIT', 500))
+        )
+        
+        unsubmitted = []
+        timed_out = []
+        asset_hashes = set()
+        for video in videos:
+            if video.duplicate_of:
+                asset_hashes.add(video.prompt_hash)
+            elif video.veo_job_id:
+                if (video.submitted_at or video.updated_at) < now - timedelta(seconds=operation_timeout):
+                    timed_out.append(video)
+            elif video.updated_at < now - timedelta(seconds=submit_timeout):
+                if video.lease_expires_at is None or video.lease_expires_at < now:
+                    unsubmitted.append(video)
+        
+        # The operation may still be known to the Redis cache even though the row lost it
+        recovered = {}
+        for video in unsubmitted:
+            operation_data = cache.get(f'veo_operation:{video.id}') or {}
+            if operation_data.get('operation_name'):
+                recovered[video.id] = operation_data['operation_name']
+        if recovered:
+            VideoGeneration._get_collection().bulk_write([
+                UpdateOne(
+                    {'_id': video_id, 'status': 'processing', 'veo_job_id': None},
+                    {'$set': {'veo_job_id': operation_name, 'lease_expires_at': None, 'next_poll_at': now}}
+                )
+                for video_id, operation_name in recovered.items()
+            ], ordered=False)
+        
+        summary = {
+            'scanned': len(videos),
+            'recovered': len(recovered),
+            'requeued': requeue_stale_videos([video for video in unsubmitted if video.id not in recovered]),
+            'failed': fail_stale_videos(
+                timed_out, f'Video generation timed out after {operation_timeout} seconds'
+            ),
+            'propagated': sum(propagate_prompt_asset(asset_hash) for asset_hash in asset_hashes),
+        }
+        if videos:
+            logger.info(f"Stale video sweep: {summary}")
+        return summary
+    
+    except Exception as e:
+        logger.error(f"Error reaping stale videos: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+    
+    finally:
+        cache.delete(lock_key)
+
+
+@shared_task
+def reconcile_project_progress(project_id: str = None):
+    """
+    Rebuild Redis progress counters từ Mongo (một aggregation cho tất cả projects)
+    
+    Args:
+        project_id: Chỉ rebuild project này (optional)
+    
+    Returns:
+        dict with number of projects rebuilt
+    """
+    try:
+        rebuilt = progress_service.reconcile_progress(project_id)
+        logger.info(f"Reconciled progress counters for {rebuilt} projects")
+        return {'projects': rebuilt}
+    
+    except Exception as e:
+        logger.error(f"Error reconciling progress counters: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task
+def build_data_file_snapshot(data_file_id: str):
+    """
+    Parse data file một lần và ghi column snapshot cho các bước sau
+    
+    Args:
+        data_file_id: MongoDB ObjectId string of DataFile
+    
+    Returns:
+        dict with snapshot path and exact row count
+    """
+    try:
+        data_file = DataFile.objects.get(id=ObjectId(data_file_id))
+        full_path = os.path.join(settings.MEDIA_ROOT, data_file.file_path)
+        
+        df = data_file_service.read_data_file(full_path, data_file.file_type)
+        snapshot_path = data_file_service.build_column_snapshot(df, data_file.file_path)
+        
+        # The upload step only estimates the row count, store the exact one
+        DataFile.objects(id=data_file.id).update_one(
+            set__snapshot_path=snapshot_path,
+            set__total_rows=len(df)
+        )
+        
+        logger.info(f"Built snapshot for data file {data_file_id}: {snapshot_path}")
+        return {
+            'success': True,
+            'data_file_id': data_file_id,
+            'snapshot_path': snapshot_path,
+            'total_rows': len(df)
+        }
+    
+    except DoesNotExist:
+        error_msg = f"DataFile with id {data_file_id} not found"
+        logger.error(error_msg)
+        return {
+            'success': False,
+            'error': error_msg
+        }
+    
+    except Exception as e:
+        error_msg = f"Error building snapshot for data file {data_file_id}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return {
+            'success': False,
+            'error': error_msg
+        }
+
+
+def build_prompt_hash(prompt: str) -> str:
+    """Prompt hash với generation parameters mặc định của Veo"""
+    return prompt_template_service.prompt_hash(
+        prompt,
+        veo_service.DEFAULT_ASPECT_RATIO,
+        veo_service.DEFAULT_RESOLUTION,
+        veo_service.VEO_MODEL
+    )
+
+
+def render_prompts(compiled_template, batch) -> list:
+    """
+    Render prompts cho một batch rows (DataFrame)
+    
+    Gemini enrichment (nếu bật) chạy sau, theo từng chunk trước khi submit (enrich_pending_prompts).
+    """
+    # Fill template for the whole batch at once
+    return compiled_template.render_dataframe(batch).tolist()
+
+
+def enrich_pending_prompts(video_ids: list) -> int:
+    """
+    Dùng Gemini cải thiện prompt của các rows pending chưa được enrich
+    
+    Chạy trong generate_video_chunk trước khi submit, nên rows được enrich và gửi lên
+    Veo dần theo từng chunk thay vì đợi cả file đi qua Gemini.
+    
+    Args:
+        video_ids: List of MongoDB ObjectId strings of VideoGeneration
+    
+    Returns:
+        Số rows được update
+    """
+    rows = list(
+        VideoGeneration.objects(
+            id__in=[ObjectId(video_id) for video_id in video_ids],
+            status='pending',
+            prompt_enriched__ne=True
+        ).only('id', 'prompt_used').as_pymongo()
+    )
+    if not rows:
+        return 0
+    
+    # Falls back to the rendered prompt for rows Gemini could not enrich
+    prompts = gemini_service.enrich_row_prompts([row['prompt_used'] for row in rows])
+    now = datetime.utcnow()
+    result = VideoGeneration._get_collection().bulk_write([
+        # prompt_used guard: skip rows re-rendered by reset_failed_videos meanwhile
+        UpdateOne(
+            {'_id': row['_id'], 'status': 'pending', 'prompt_used': row['prompt_used']},
+            {'$set': {
+                'prompt_used': prompt,
+                'prompt_hash': build_prompt_hash(prompt),
+                'prompt_enriched': True,
+                'updated_at': now,
+            }}
+        )
+        for row, prompt in zip(rows, prompts)
+    ], ordered=False)
+    return result.modified_count
+
+
+def enrich_prompts_if_enabled(video_ids: list):
+    """enrich_pending_prompts khi GEMINI_ROW_ENRICHMENT_ENABLED; lỗi không chặn việc submit"""
+    if not getattr(settings, 'GEMINI_ROW_ENRICHMENT_ENABLED', False):
+        return
+    try:
+        enriched = enrich_pending_prompts(video_ids)
+        if enriched:
+            logger.info(f"Enriched {enriched} prompts with Gemini")
+    except Exception as e:
+        logger.warning(f"Prompt enrichment skipped: {str(e)}")
+
+
+def upsert_video_generations(documents: list) -> list:
+    """
+    Tạo VideoGeneration documents chưa tồn tại bằng một bulk write, key là (project, row_index)
+    
+    Rows đã có (từ lần chạy trước) được giữ nguyên.
+    
+    Args:
+        documents: List of unsaved VideoGeneration documents
+    
+    Returns:
+        ObjectId strings của các documents được tạo mới, theo thứ tự row
+    """
+    if not documents:
+        return []
+    
+    operations = []
+    for document in documents:
+        data = document.to_mongo().to_dict()
+        data.pop('_id', None)
+        operations.append(UpdateOne(
+            {'project': data['project'], 'row_index': data['row_index']},
+            {'$setOnInsert': data},
+            upsert=True
+        ))
+    
+    result = VideoGeneration._get_collection().bulk_write(operations, ordered=False)
+    return [str(result.upserted_ids[position]) for position in sorted(result.upserted_ids)]
+
+
+def reset_failed_videos(project_id: str, compiled_template):
+    """
+    Đưa các videos failed của project về pending, render lại prompt từ row_data với template hiện tại
+    
+    Yields:
+        ObjectId strings của các videos được reset, mỗi lần một batch
+    """
+    batch_size = getattr(settings, 'VIDEO_GENERATION_BATCH_SIZE', 500)
+    failed = list(
+        VideoGeneration.objects(project=ObjectId(project_id), status='failed')
+        .only('id', 'row_index', 'row_data')
+        .as_pymongo()
+    )
+    
+    for start in range(0, len(failed), batch_size):
+        rows = failed[start:start + batch_size]
+        batch = pd.DataFrame.from_records(
+            [row.get('row_data') or {} for row in rows],
+            index=[row['row_index'] for row in rows]
+        )
+        prompts = render_prompts(compiled_template, batch)
+        now = datetime.utcnow()
+        VideoGeneration._get_collection().bulk_write([
+            UpdateOne(
+                {'_id': row['_id'], 'status': 'failed'},
+                {'$set': {
+                    'status': 'pending',
+                    'prompt_used': prompt,
+                    'prompt_hash': build_prompt_hash(prompt),
+                    'prompt_enriched': False,
+                    'submit_attempts': 0,
+                    'next_attempt_at': None,
+                    'duplicate_of': None,
+                    'veo_job_id': None,
+                    'error_message': None,
+                    'updated_at': now,
+                }}
+            )
+            for row, prompt in zip(rows, prompts)
+        ], ordered=False)
+        yield [str(row['_id']) for row in rows]
+
+
+def queue_video_chunks(video_ids: list) -> int:
+    """
+    Queue generate_video_chunk cho video_ids, mỗi message VIDEO_GENERATION_CHUNK_SIZE rows
+    
+    Returns:
+        Số chunk tasks đã queue
+    """
+    chunk_size = getattr(settings, 'VIDEO_GENERATION_CHUNK_SIZE', 50)
+    chunk_count = 0
+    for start in range(0, len(video_ids), chunk_size):
+        generate_video_chunk.delay(video_ids[start:start + chunk_size])
+        chunk_count += 1
+    return chunk_count
+
+
 @shared_task
 def batch_generate_videos(project_id: str):
     """
     Generate videos for all rows in a project
     
+    Idempotent và resumable: rows được upsert theo (project, row_index) và
+    Project.generation_checkpoint lưu row_index cuối cùng đã được ghi, nên chạy lại
+    task chỉ tạo rows còn thiếu và reset rows failed. Mỗi batch được queue ngay sau
+    khi ghi; rows pending của lần chạy trước chỉ được queue lại khi không có retry /
+    throttled message đang chờ (next_attempt_at).
+    
     Args:
         project_id: MongoDB ObjectId string of Project
     
@@ -201,59 +1468,91 @@ def batch_generate_videos(project_id: str):
         data_file = DataFile.objects.get(project=project)
         prompt_template = PromptTemplate.objects.get(project=project)
         
-        # Read the data file
-        import pandas as pd
-        file_path = os.path.join(settings.MEDIA_ROOT, data_file.file_path)
-        
-        if data_file.file_type == 'csv':
-            df = pd.read_csv(file_path, encoding='utf-8-sig')
-        else:
-            df = pd.read_excel(file_path, engine='openpyxl')
-        
         # Update project status
         project.status = 'generating'
+        project.generation_queueing = True
         project.save()
         
-        # Create VideoGeneration objects and queue tasks
-        created_videos = []
-        tasks_started = []
+        batch_size = getattr(settings, 'VIDEO_GENERATION_BATCH_SIZE', 500)
+        compiled_template = prompt_template_service.compile_template(prompt_template.template)
+        checkpoint = project.generation_checkpoint
+        created = 0
+        
+        # Upserts still work without the unique index (old databases with duplicate rows)
+        VideoGeneration.ensure_unique_row_index()
+        
+        # Rows left pending by a previous run (crashed, or their message was lost)
+        now = datetime.utcnow()
+        pending_ids = [
+            str(row['_id'])
+            for row in VideoGeneration.objects(
+                Q(project=project.id, status='pending') &
+                (Q(next_attempt_at=None) | Q(next_attempt_at__lte=now))
+            ).only('id').order_by('row_index').as_pymongo()
+        ]
+        queued = len(pending_ids)
+        chunk_count = queue_video_chunks(pending_ids)
+        
+        reset = 0
+        for reset_ids in reset_failed_videos(project_id, compiled_template):
+            reset += len(reset_ids)
+            queued += len(reset_ids)
+            chunk_count += queue_video_chunks(reset_ids)
         
-        for index, row in df.iterrows():
-            row_data = row.to_dict()
+        # Read the data file (memory-mapped column snapshot when available)
+        for batch in data_file_service.iter_row_batches(data_file, batch_size):
+            if len(batch) == 0 or int(batch.index[-1]) <= checkpoint:
+                # Persisted by a previous run
+                continue
+            batch = batch[batch.index > checkpoint]
             
-            # Fill template with row data
-            filled_prompt = prompt_template.template
-            for key, value in row_data.items():
-                placeholder = f"{{{{{key}}}}}"
-                filled_prompt = filled_prompt.replace(placeholder, str(value))
+            prompts = render_prompts(compiled_template, batch)
+            documents = [
+                VideoGeneration(
+                    project=project,
+                    row_index=int(index),
+                    row_data=row_data,
+                    prompt_used=prompt,
+                    prompt_hash=build_prompt_hash(prompt),
+                    status='pending'
+                )
+                for index, row_data, prompt in zip(batch.index, batch.to_dict('records'), prompts)
+            ]
             
-            # Create VideoGeneration record
-            video_gen = VideoGeneration(
-                project=project,
-                row_index=int(index),
-                row_data=row_data,
-                prompt_used=filled_prompt,
-                status='pending'
-            )
-            video_gen.save()
+            inserted_ids = upsert_video_generations(documents)
+            created += len(inserted_ids)
+            progress_service.add_pending(project_id, len(inserted_ids))
             
-            created_videos.append(str(video_gen.id))
+            checkpoint = int(batch.index[-1])
+            Project.objects(id=project.id).update_one(set__generation_checkpoint=checkpoint)
             
-            # Queue Celery task for async processing
-            task = generate_single_video.delay(str(video_gen.id))
-            tasks_started.append({
-                'video_id': str(video_gen.id),
-                'task_id': task.id
-            })
+            # Start generating this batch while the rest of the file is read
+            queued += len(inserted_ids)
+            chunk_count += queue_video_chunks(inserted_ids)
+        
+        try:
+            progress_service.reconcile_progress(project_id)
+        except Exception as e:
+            logger.warning(f"Could not reconcile progress counters for project {project_id}: {str(e)}")
+        
+        # Throttled and retried rows finish outside the chunk tasks, so the project is completed
+        # by whichever row reaches a final status last (or here, if they all already did)
+        Project.objects(id=project.id).update_one(set__generation_queueing=False)
+        update_project_completion(project_id)
         
-        logger.info(f"Started {len(tasks_started)} video generation tasks for project {project_id}")
+        logger.info(
+            f"Project {project_id}: created {created} videos, reset {reset} failed, "
+            f"queued {queued} in {chunk_count} chunks"
+        )
         
         return {
             'success': True,
             'project_id': project_id,
-            'video_count': len(created_videos),
-            'tasks_started': len(tasks_started),
-            'message': f'Started generating {len(created_videos)} videos'
+            'created_count': created,
+            'reset_count': reset,
+            'video_count': queued,
+            'tasks_started': chunk_count,
+            'message': f'Started generating {queued} videos'
         }
     
     except DoesNotExist as e:
@@ -272,6 +1571,7 @@ def batch_generate_videos(project_id: str):
         try:
             project = Project.objects.get(id=ObjectId(project_id))
             project.status = 'editing_prompt'
+            project.generation_queueing = False
             project.save()
         except:
             pass
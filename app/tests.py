@@ -1,3 +1,417 @@
-from django.test import TestCase
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from unittest import mock
+import httpx
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from django.test import SimpleTestCase, override_settings
+from google.genai import errors, types
 
-# Create your tests here.
+from . import tasks
+from .mongodb_models import VideoGeneration
+from .services import data_file_service, prompt_template_service, veo_service
+from .views import _parse_byte_range
+
+
+class CompiledTemplateTests(SimpleTestCase):
+    def test_column_with_surrounding_whitespace(self):
+        columns = ['Tên ', 'age']
+        template = 'Create a video about {{Tên }}, {{age}}'
+        compiled = prompt_template_service.compile_template(template)
+
+        self.assertEqual(prompt_template_service.find_unknown_placeholders(template, columns), [])
+        self.assertEqual(compiled.render({'Tên ': 'An', 'age': 30}), 'Create a video about An, 30')
+
+        df = pd.DataFrame({'Tên ': ['An', 'Bình'], 'age': [30, 41]})
+        self.assertEqual(
+            compiled.render_dataframe(df).tolist(),
+            ['Create a video about An, 30', 'Create a video about Bình, 41']
+        )
+
+    def test_whitespace_inside_braces_falls_back_to_stripped_name(self):
+        columns = ['name']
+        template = 'Hello {{ name }}'
+        compiled = prompt_template_service.compile_template(template)
+
+        self.assertEqual(prompt_template_service.find_unknown_placeholders(template, columns), [])
+        self.assertEqual(compiled.render({'name': 'An'}), 'Hello An')
+
+    def test_unknown_placeholder_is_kept(self):
+        template = 'Hello {{missing}}'
+        compiled = prompt_template_service.compile_template(template)
+
+        self.assertEqual(prompt_template_service.find_unknown_placeholders(template, ['name']), ['missing'])
+        df = pd.DataFrame({'name': ['An']})
+        self.assertEqual(compiled.render_dataframe(df).tolist(), ['Hello {{missing}}'])
+
+
+class ColumnSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def build(self, df):
+        path = data_file_service.build_column_snapshot(df, 'data.csv')
+        return data_file_service.ColumnSnapshot(path)
+
+    def test_round_trip(self):
+        df = pd.DataFrame({
+            'Tên': ['An', None, 'Bình', ''],
+            'age': [30, 41, 25, 60],
+            'score': [1.5, np.nan, 2.0, 3.25],
+            'mixed': [1, 'a', None, 2.5],
+        })
+        snapshot = self.build(df)
+
+        self.assertEqual(len(snapshot), 4)
+        restored = snapshot.to_dataframe()
+        self.assertEqual(restored['Tên'].tolist()[0::2], ['An', 'Bình'])
+        self.assertTrue(pd.isna(restored['Tên'][1]))
+        self.assertEqual(restored['Tên'][3], '')
+        self.assertEqual(restored['age'].tolist(), [30, 41, 25, 60])
+        self.assertTrue(np.isnan(restored['score'][1]))
+        self.assertEqual(restored['mixed'].tolist()[:2], ['1', 'a'])
+
+        batch = snapshot.slice(1, 3)
+        self.assertEqual(batch.index.tolist(), [1, 2])
+        self.assertEqual(batch['Tên'][2], 'Bình')
+
+    def test_text_size_follows_content(self):
+        texts = ['x'] * 10000
+        texts[0] = 'y' * 5000
+        snapshot = self.build(pd.DataFrame({'description': texts}))
+
+        size = sum(
+            os.path.getsize(os.path.join(snapshot.path, name)) for name in os.listdir(snapshot.path)
+        )
+        # UTF-8 data + int64 offsets + mask, not rows * longest cell
+        self.assertLess(size, 200 * 1024)
+        self.assertEqual(snapshot.slice(0, 2)['description'].tolist(), ['y' * 5000, 'x'])
+
+    def test_empty_text_column(self):
+        snapshot = self.build(pd.DataFrame({'note': ['', None]}))
+
+        restored = snapshot.to_dataframe()
+        self.assertEqual(restored['note'][0], '')
+        self.assertTrue(pd.isna(restored['note'][1]))
+
+
+class FakeOperations:
+    """Stub của client.operations: trả operation theo name, exception được raise (Veo unreachable)"""
+
+    def __init__(self, operations):
+        self.operations = operations
+        self.requested = []
+
+    def get(self, operation):
+        self.requested.append(operation.name)
+        result = self.operations[operation.name]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class FakeVeoClient:
+    def __init__(self, operations):
+        self.operations = FakeOperations(operations)
+
+
+def processing_operation(name):
+    return types.GenerateVideosOperation(name=name, done=False)
+
+
+def completed_operation(name, uri='https://example.com/video.mp4'):
+    return types.GenerateVideosOperation(
+        name=name,
+        done=True,
+        response=types.GenerateVideosResponse(
+            generated_videos=[types.GeneratedVideo(video=types.Video(uri=uri))]
+        )
+    )
+
+
+def failed_operation(name, code=3, message='Prompt blocked by safety filters'):
+    return types.GenerateVideosOperation(name=name, done=True, error={'code': code, 'message': message})
+
+
+class CheckOperationStatusTests(SimpleTestCase):
+    def check(self, result):
+        client = FakeVeoClient({'operations/1': result})
+        return veo_service.check_operation_status('operations/1', client=client)
+
+    def test_processing(self):
+        status = self.check(processing_operation('operations/1'))
+
+        self.assertEqual(status['status'], 'processing')
+        self.assertIsNone(status['video_url'])
+
+    def test_completed(self):
+        status = self.check(completed_operation('operations/1'))
+
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['video_url'], 'https://example.com/video.mp4')
+
+    def test_completed_without_video_fails(self):
+        operation = types.GenerateVideosOperation(
+            name='operations/1', done=True, response=types.GenerateVideosResponse(generated_videos=[])
+        )
+        with self.assertLogs(veo_service.logger, 'WARNING'):
+            status = self.check(operation)
+
+        self.assertEqual(status['status'], 'failed')
+        self.assertTrue(veo_service.is_permanent_failure(status))
+
+    def test_failed(self):
+        with self.assertLogs(veo_service.logger, 'ERROR'):
+            status = self.check(failed_operation('operations/1'))
+
+        self.assertEqual(status['status'], 'failed')
+        self.assertEqual(status['error'], 'Prompt blocked by safety filters')
+        self.assertEqual(status['error_code'], 3)
+        self.assertTrue(veo_service.is_permanent_failure(status))
+
+    def test_failed_with_transient_code(self):
+        with self.assertLogs(veo_service.logger, 'ERROR'):
+            status = self.check(failed_operation('operations/1', code=14, message='Service unavailable'))
+
+        self.assertEqual(status['status'], 'failed')
+        self.assertFalse(veo_service.is_permanent_failure(status))
+
+    def test_unreachable(self):
+        with self.assertLogs(veo_service.logger, 'ERROR'):
+            status = self.check(ConnectionError('connection reset'))
+
+        self.assertEqual(status['status'], 'error')
+        self.assertEqual(status['error'], 'connection reset')
+
+
+class RefreshVideoOperationsTests(SimpleTestCase):
+    def setUp(self):
+        self.client = FakeVeoClient({
+            'operations/processing': processing_operation('operations/processing'),
+            'operations/completed': completed_operation('operations/completed'),
+            'operations/failed': failed_operation('operations/failed'),
+            'operations/unreachable': ConnectionError('connection reset'),
+        })
+        self.collection = mock.Mock()
+        self.project_id = ObjectId()
+
+        patches = {
+            'get_veo_client': mock.patch.object(veo_service, 'get_veo_client', return_value=self.client),
+            'collection': mock.patch.object(VideoGeneration, '_get_collection', return_value=self.collection),
+            'release_slot': mock.patch.object(tasks.rate_limiter, 'release_veo_slot'),
+            'publish': mock.patch.object(tasks.progress_service, 'publish_status_change'),
+            'record_durations': mock.patch.object(tasks.poll_schedule_service, 'record_durations'),
+            'finish_asset': mock.patch.object(tasks, 'finish_prompt_asset'),
+            'complete_project': mock.patch.object(tasks, 'update_project_completion'),
+            'download': mock.patch.object(tasks, 'download_completed_videos'),
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patches.items()}
+        for patcher in patches.values():
+            self.addCleanup(patcher.stop)
+
+    def video(self, operation_name):
+        return VideoGeneration(
+            id=ObjectId(),
+            project=self.project_id,
+            row_index=0,
+            row_data={'name': 'An'},
+            prompt_used='A cat',
+            status='processing',
+            veo_job_id=operation_name,
+            submitted_at=datetime.utcnow() - timedelta(seconds=90),
+            poll_count=2
+        )
+
+    def updates(self):
+        (operations,), _ = self.collection.bulk_write.call_args
+        return {operation._filter['_id']: operation._doc['$set'] for operation in operations}
+
+    def test_outcomes(self):
+        videos = {
+            status: self.video(f'operations/{status}')
+            for status in ('processing', 'completed', 'failed', 'unreachable')
+        }
+
+        with self.assertLogs(veo_service.logger, 'ERROR'):
+            summary = tasks.refresh_video_operations(list(videos.values()))
+
+        self.assertEqual(
+            summary, {'polled': 4, 'completed': 1, 'failed': 1, 'processing': 1, 'error': 1}
+        )
+        self.assertEqual(len(self.client.operations.requested), 4)
+
+        updates = self.updates()
+        completed = updates[videos['completed'].id]
+        self.assertEqual(completed['status'], 'completed')
+        self.assertEqual(completed['video_url'], 'https://example.com/video.mp4')
+        self.assertIsNone(completed['next_poll_at'])
+
+        failed = updates[videos['failed'].id]
+        self.assertEqual(failed['status'], 'failed')
+        self.assertEqual(failed['error_message'], 'Prompt blocked by safety filters')
+
+        # Still running or unreachable: stays processing and is polled again later
+        for status in ('processing', 'unreachable'):
+            self.assertNotIn('status', updates[videos[status].id])
+            self.assertGreater(updates[videos[status].id]['next_poll_at'], datetime.utcnow())
+
+        self.mocks['finish_asset'].assert_any_call(
+            videos['completed'].id, 'completed', 'https://example.com/video.mp4', error=None, permanent=False
+        )
+        self.mocks['finish_asset'].assert_any_call(
+            videos['failed'].id, 'failed', None, error='Prompt blocked by safety filters', permanent=True
+        )
+        self.assertEqual(self.mocks['release_slot'].call_count, 2)
+        self.mocks['complete_project'].assert_called_once_with(str(self.project_id))
+        self.mocks['download'].delay.assert_called_once_with([str(videos['completed'].id)])
+
+    def test_all_still_processing(self):
+        video = self.video('operations/processing')
+
+        summary = tasks.refresh_video_operations([video])
+
+        self.assertEqual(summary['processing'], 1)
+        self.mocks['finish_asset'].assert_not_called()
+        self.mocks['complete_project'].assert_not_called()
+        self.mocks['download'].delay.assert_not_called()
+
+
+def api_error(code, status=None, retry_after=None, retry_delay=None):
+    error = {'code': code, 'message': 'Veo error'}
+    if status:
+        error['status'] = status
+    if retry_delay:
+        error['details'] = [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': retry_delay}]
+    headers = {'Retry-After': retry_after} if retry_after else {}
+    return errors.APIError(code, {'error': error}, response=httpx.Response(code, headers=headers))
+
+
+class ClassifyErrorTests(SimpleTestCase):
+    def assertCategory(self, error, category):
+        classified = veo_service.classify_error(error)
+        self.assertEqual(classified.category, category)
+        return classified
+
+    def test_rate_limit(self):
+        self.assertTrue(self.assertCategory(api_error(429), veo_service.RATE_LIMIT).retryable)
+        self.assertCategory(api_error(400, status='RESOURCE_EXHAUSTED'), veo_service.RATE_LIMIT)
+
+    def test_auth(self):
+        for error in (api_error(401), api_error(403), api_error(400, status='UNAUTHENTICATED')):
+            self.assertFalse(self.assertCategory(error, veo_service.AUTH).retryable)
+
+    def test_transient(self):
+        for error in (api_error(500), api_error(503), api_error(408), api_error(409, status='ABORTED')):
+            self.assertTrue(self.assertCategory(error, veo_service.TRANSIENT).retryable)
+        self.assertCategory(ConnectionError('connection reset'), veo_service.TRANSIENT)
+        self.assertCategory(TimeoutError(), veo_service.TRANSIENT)
+
+    def test_other_client_errors_are_invalid_prompt(self):
+        for error in (api_error(400, status='INVALID_ARGUMENT'), api_error(404)):
+            self.assertFalse(self.assertCategory(error, veo_service.INVALID_PROMPT).retryable)
+        self.assertCategory(ValueError('Prompt cannot be empty'), veo_service.INVALID_PROMPT)
+
+    def test_already_classified(self):
+        error = veo_service.VeoAPIError('missing key', veo_service.AUTH)
+        self.assertIs(veo_service.classify_error(error), error)
+
+    def test_retry_after_seconds(self):
+        classified = veo_service.classify_error(api_error(429, retry_after='12'))
+        self.assertEqual(classified.retry_after, 12.0)
+
+    def test_retry_after_http_date(self):
+        classified = veo_service.classify_error(api_error(503, retry_after=formatdate(time.time() + 60, usegmt=True)))
+        self.assertAlmostEqual(classified.retry_after, 60, delta=2)
+
+    def test_retry_delay_detail(self):
+        classified = veo_service.classify_error(api_error(429, status='RESOURCE_EXHAUSTED', retry_delay='30s'))
+        self.assertEqual(classified.retry_after, 30.0)
+
+    def test_retry_after_header_wins_over_detail(self):
+        classified = veo_service.classify_error(api_error(429, retry_after='5', retry_delay='30s'))
+        self.assertEqual(classified.retry_after, 5.0)
+
+    def test_no_retry_hint(self):
+        self.assertIsNone(veo_service.classify_error(api_error(429, retry_delay='soon')).retry_after)
+        self.assertIsNone(veo_service.classify_error(api_error(503, retry_after='later')).retry_after)
+
+
+@override_settings(
+    VEO_RETRY_RATE_LIMIT_BASE_SECONDS=30,
+    VEO_RETRY_RATE_LIMIT_MAX_SECONDS=900,
+    VEO_RETRY_RATE_LIMIT_MAX_RETRIES=6,
+    VEO_RETRY_TRANSIENT_BASE_SECONDS=10,
+    VEO_RETRY_TRANSIENT_MAX_SECONDS=300,
+    VEO_RETRY_TRANSIENT_MAX_RETRIES=4,
+)
+class RetryCountdownTests(SimpleTestCase):
+    def setUp(self):
+        # Upper end of every jitter range
+        patcher = mock.patch.object(tasks.random, 'uniform', side_effect=lambda low, high: high)
+        self.uniform = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def countdown(self, category, attempt, retry_after=None):
+        return tasks.retry_countdown(veo_service.VeoAPIError('error', category, retry_after), attempt)
+
+    def test_exponential_backoff_per_class(self):
+        self.assertEqual(
+            [self.countdown(veo_service.RATE_LIMIT, attempt) for attempt in range(6)],
+            [30, 60, 120, 240, 480, 900]
+        )
+        self.assertEqual(
+            [self.countdown(veo_service.TRANSIENT, attempt) for attempt in range(4)],
+            [10, 20, 40, 80]
+        )
+
+    @override_settings(VEO_RETRY_TRANSIENT_MAX_RETRIES=20)
+    def test_capped(self):
+        self.assertEqual(self.countdown(veo_service.TRANSIENT, 5), 300)
+        self.assertEqual(self.countdown(veo_service.TRANSIENT, 19), 300)
+
+    def test_equal_jitter(self):
+        self.countdown(veo_service.RATE_LIMIT, 2)
+        self.uniform.assert_called_once_with(60, 120)
+
+    def test_server_hint(self):
+        # Longer hint wins (plus up to one base of jitter), shorter hint keeps the backoff
+        self.assertEqual(self.countdown(veo_service.RATE_LIMIT, 0, retry_after=120), 150)
+        self.assertEqual(self.countdown(veo_service.RATE_LIMIT, 3, retry_after=5), 240)
+
+    def test_exhausted(self):
+        self.assertIsNone(self.countdown(veo_service.RATE_LIMIT, 6))
+        self.assertIsNone(self.countdown(veo_service.TRANSIENT, 4))
+
+    def test_permanent_errors_not_retried(self):
+        self.assertIsNone(self.countdown(veo_service.INVALID_PROMPT, 0))
+        self.assertIsNone(self.countdown(veo_service.AUTH, 0))
+
+
+class ParseByteRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(_parse_byte_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(_parse_byte_range('bytes=500-', 1000), (500, 999))
+        self.assertEqual(_parse_byte_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(_parse_byte_range('Bytes = 10-10', 1000), (10, 10))
+
+    def test_suffix_ranges(self):
+        self.assertEqual(_parse_byte_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(_parse_byte_range('bytes=-5000', 1000), (0, 999))
+
+    def test_ignored_headers(self):
+        # Served as the whole file
+        for header in ('items=0-99', 'bytes=0-1,5-6', 'bytes=abc', 'bytes=-', 'bytes=5-1', 'bytes=1-x', 'bytes'):
+            self.assertIsNone(_parse_byte_range(header, 1000), header)
+
+    def test_not_satisfiable(self):
+        for header, size in (('bytes=1000-', 1000), ('bytes=1000-2000', 1000), ('bytes=-0', 1000), ('bytes=-5', 0)):
+            with self.assertRaises(ValueError, msg=header):
+                _parse_byte_range(header, size)
@@ -1,21 +1,26 @@
 import os
 import json
 import logging
-import pandas as pd
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from django.core.cache import cache
 # Use MongoDB models instead of Django ORM models
 from .mongodb_models import Project, DataFile, PromptTemplate, VideoGeneration
-from .services import gemini_service, veo_service
-from .tasks import batch_generate_videos, generate_single_video, check_video_status_task
+from .services import gemini_service, veo_service, data_file_service, prompt_template_service, progress_service
+from .tasks import batch_generate_videos, generate_single_video, check_video_status_task, build_data_file_snapshot
 import re
+import time
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Overlap between consecutive status cursors to absorb in-flight writes
+STATUS_CURSOR_OVERLAP_SECONDS = 2
+
 
 def index(request):
     """Redirect to step 1 or create new project"""
@@ -41,21 +46,13 @@ def step1_upload(request):
         else:
             return JsonResponse({'error': 'Unsupported file type. Please upload CSV or Excel file.'}, status=400)
         
-        # Save file to media folder
-        import os
-        from django.core.files.storage import default_storage
-        from django.core.files.base import ContentFile
-        
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads', 'data_files')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = default_storage.save(
-            os.path.join('uploads', 'data_files', uploaded_file.name),
-            ContentFile(uploaded_file.read())
-        )
-        full_file_path = os.path.join(settings.MEDIA_ROOT, file_path)
+        # Stream file to media folder chunk by chunk (constant memory)
+        try:
+            saved_file = data_file_service.save_uploaded_file(uploaded_file)
+        except data_file_service.FileTooLargeError as e:
+            return JsonResponse({'error': str(e)}, status=413)
+        file_path = saved_file['file_path']
+        full_file_path = saved_file['full_path']
         
         # Create project in MongoDB
         project = Project(name=project_name, status='uploading')
@@ -63,22 +60,11 @@ def step1_upload(request):
         
         # Parse file and detect columns
         try:
-            # Read file without normalizing column names
+            # Inspect header, preview and row count in constant memory
             # Keep original column names as they appear in the file
-            if file_type == 'csv':
-                # Read CSV with original column names, handle encoding
-                df = pd.read_csv(full_file_path, encoding='utf-8-sig')
-            else:
-                # Read Excel with original column names
-                df = pd.read_excel(full_file_path, engine='openpyxl')
-            
-            # Get original column names (preserve Vietnamese characters, spaces, etc.)
-            columns = df.columns.tolist()
-            total_rows = len(df)
-            
-            # Ensure columns are stored as list of strings (not normalized)
-            # Convert any non-string column names to strings while preserving original format
-            columns = [str(col) for col in columns]
+            file_info = data_file_service.inspect_data_file(full_file_path, file_type)
+            columns = file_info['columns']
+            total_rows = file_info['total_rows']
             
             # Create DataFile in MongoDB
             data_file = DataFile(
@@ -86,10 +72,18 @@ def step1_upload(request):
                 file_path=file_path,
                 file_type=file_type,
                 columns=columns,
-                total_rows=total_rows
+                total_rows=total_rows,
+                file_size=saved_file['size'],
+                file_hash=saved_file['sha256']
             )
             data_file.save()
             
+            # Build columnar snapshot in the background so later steps don't re-parse the file
+            try:
+                build_data_file_snapshot.delay(str(data_file.id))
+            except Exception as e:
+                logger.warning(f"Could not queue snapshot build for data file {data_file.id}: {str(e)}")
+            
             # Update project status
             project.status = 'editing_prompt'
             project.save()
@@ -99,7 +93,7 @@ def step1_upload(request):
                 'project_id': str(project.id),  # Convert ObjectId to string
                 'columns': columns,
                 'total_rows': total_rows,
-                'preview': df.head(5).to_dict('records')  # First 5 rows as preview
+                'preview': file_info['preview']  # First 5 rows as preview
             })
         
         except Exception as e:
@@ -165,30 +159,45 @@ def step2_prompt(request, project_id):
     return render(request, 'app/step2_prompt.html', context)
 
 
+def _parse_suggest_prompt_request(request):
+    """
+    Parse và validate body của suggest-prompt requests
+    
+    Returns:
+        Tuple (template, fields, force_refresh, error JsonResponse hoặc None)
+    """
+    data = json.loads(request.body)
+    template = data.get('template', '').strip()
+    fields = data.get('fields', [])
+    force_refresh = bool(data.get('force_refresh', False))
+    
+    # Validate input
+    if not template:
+        return template, fields, force_refresh, JsonResponse({'error': 'Template is required'}, status=400)
+    
+    if not fields:
+        return template, fields, force_refresh, JsonResponse({'error': 'Fields are required'}, status=400)
+    
+    # Ensure fields is a list
+    if not isinstance(fields, list):
+        return template, fields, force_refresh, JsonResponse({'error': 'Fields must be an array'}, status=400)
+    
+    if len(fields) == 0:
+        return template, fields, force_refresh, JsonResponse({'error': 'At least one field is required'}, status=400)
+    
+    return template, fields, force_refresh, None
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_gemini_suggest_prompt(request):
     """API endpoint: Get prompt suggestion from Gemini"""
     try:
-        data = json.loads(request.body)
-        template = data.get('template', '').strip()
-        fields = data.get('fields', [])
-        
-        # Validate input
-        if not template:
-            return JsonResponse({'error': 'Template is required'}, status=400)
+        template, fields, force_refresh, error_response = _parse_suggest_prompt_request(request)
+        if error_response:
+            return error_response
         
-        if not fields:
-            return JsonResponse({'error': 'Fields are required'}, status=400)
-        
-        # Ensure fields is a list
-        if not isinstance(fields, list):
-            return JsonResponse({'error': 'Fields must be an array'}, status=400)
-        
-        if len(fields) == 0:
-            return JsonResponse({'error': 'At least one field is required'}, status=400)
-        
-        suggested_prompt = gemini_service.generate_prompt_suggestion(template, fields)
+        suggested_prompt = gemini_service.generate_prompt_suggestion(template, fields, force_refresh=force_refresh)
         
         return JsonResponse({
             'success': True,
@@ -205,16 +214,98 @@ def api_gemini_suggest_prompt(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+async def _iterate_in_thread(iterator):
+    """Async iterator lấy từng phần tử của một sync iterator trong worker thread"""
+    from asgiref.sync import sync_to_async
+    
+    done = object()
+    next_part = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            part = await next_part(iterator, done)
+            if part is done:
+                break
+            yield part
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=False)()
+
+
+def _streaming_content(request, iterator):
+    """
+    Streaming content theo server đang chạy: sync iterator dưới WSGI, async iterator dưới ASGI
+    
+    StreamingHttpResponse đọc hết iterator vào một list khi kiểu iterator không khớp
+    với handler, nên response chỉ được gửi đi sau khi iterator kết thúc.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    
+    if isinstance(request, ASGIRequest):
+        return _iterate_in_thread(iterator)
+    return iterator
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_gemini_suggest_prompt_stream(request):
+    """
+    API endpoint (SSE): Stream prompt suggestion từ Gemini theo từng chunk
+    
+    Events: `chunk` {text}, cuối cùng là `done` {suggested_prompt} hoặc `error` {error}
+    """
+    try:
+        template, fields, force_refresh, error_response = _parse_suggest_prompt_request(request)
+        if error_response:
+            return error_response
+    except json.JSONDecodeError as e:
+        return JsonResponse({'error': f'Invalid JSON: {str(e)}'}, status=400)
+    
+    def event_stream():
+        parts = []
+        try:
+            for text in gemini_service.stream_prompt_suggestion(template, fields, force_refresh=force_refresh):
+                parts.append(text)
+                yield _sse_message('chunk', {'text': text})
+            yield _sse_message('done', {'suggested_prompt': ''.join(parts).strip()})
+        except Exception as e:
+            logger.error(f"Error in api_gemini_suggest_prompt_stream: {str(e)}", exc_info=True)
+            yield _sse_message('error', {'error': str(e)})
+    
+    response = StreamingHttpResponse(_streaming_content(request, event_stream()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 @require_http_methods(["POST"])
 def save_prompt_template(request, project_id):
     """Save prompt template"""
-    project = get_object_or_404(Project, id=project_id)
+    from bson import ObjectId
+    from mongoengine import DoesNotExist
+    
+    try:
+        project = Project.objects.get(id=ObjectId(project_id))
+    except (DoesNotExist, Exception):
+        return JsonResponse({'error': 'Project not found'}, status=404)
     
     try:
         data = json.loads(request.body)
         template = data.get('template', '')
         
-        prompt_template, created = PromptTemplate.objects.get_or_create(project=project)
+        # Report unknown placeholders now instead of during generation
+        data_file = DataFile.objects(project=project).first()
+        if data_file:
+            unknown_fields = prompt_template_service.find_unknown_placeholders(template, data_file.columns)
+            if unknown_fields:
+                return JsonResponse({
+                    'error': 'Unknown placeholders: ' + ', '.join(f'{{{{{field}}}}}' for field in unknown_fields),
+                    'unknown_fields': unknown_fields
+                }, status=400)
+        
+        prompt_template = PromptTemplate.objects(project=project).first()
+        if prompt_template is None:
+            prompt_template = PromptTemplate(project=project)
         prompt_template.template = template
         prompt_template.save()
         
@@ -319,58 +410,376 @@ def api_start_video_generation(request, project_id):
 
 @require_http_methods(["GET"])
 def api_veo_status(request, video_id):
-    """API endpoint: Check Veo video generation status using Redis cache"""
+    """
+    API endpoint: Check Veo video generation status using Redis cache
+    
+    Status refreshes are single-flight: mỗi video chỉ có tối đa một check_video_status_task
+    trong mỗi VEO_STATUS_MIN_REFRESH_SECONDS, các requests khác nhận status đã cache.
+    """
     from bson import ObjectId
     from mongoengine import DoesNotExist
     
+    # Fresh result from a recent status check, no Mongo or broker access needed
+    cached_status = cache.get(f'veo_status:{video_id}')
+    if cached_status:
+        return JsonResponse(dict(cached_status, message='Cached status'))
+    
     try:
         video_gen = VideoGeneration.objects.get(id=ObjectId(video_id))
     except (DoesNotExist, Exception) as e:
         logger.error(f"Video generation not found: {video_id}, error: {str(e)}")
         return JsonResponse({'error': 'Video generation not found'}, status=404)
     
-    # Get operation data from Redis cache
-    cache_key = f'veo_operation:{video_id}'
-    operation_data = cache.get(cache_key)
+    response_data = {
+        'status': video_gen.status,
+        'video_id': str(video_id),
+    }
     
-    if not operation_data:
-        logger.debug(f"No operation found in Redis cache for video {video_id}")
-        return JsonResponse({
-            'status': video_gen.status,
-            'video_id': str(video_id),
-            'message': 'No operation found. Video may not have started yet or cache expired.'
-        })
+    # If video is already completed, include video URL
+    if video_gen.status == 'completed' and video_gen.video_url:
+        response_data['video_url'] = video_gen.video_url
+    if video_gen.video_file_path:
+        response_data['file_url'] = reverse('serve_video', args=[str(video_id)])
+    
+    # If video failed, include error message
+    if video_gen.status == 'failed' and video_gen.error_message:
+        response_data['error'] = video_gen.error_message
+    
+    if video_gen.status != 'processing':
+        return JsonResponse(dict(response_data, message=f'Video is {video_gen.status}'))
+    
+    # Operation name is stored on the record, fall back to the Redis cache entry
+    operation_name = video_gen.veo_job_id
+    if not operation_name:
+        operation_data = cache.get(f'veo_operation:{video_id}') or {}
+        operation_name = operation_data.get('operation_name')
+    
+    if not operation_name:
+        logger.debug(f"No operation found for video {video_id}")
+        return JsonResponse(dict(
+            response_data,
+            message='No operation found. Video may not have started yet or cache expired.'
+        ))
+    
+    response_data['operation_name'] = operation_name
+    
+    # The poller refreshes the operation when next_poll_at is due, nothing to queue before that
+    if video_gen.next_poll_at and video_gen.next_poll_at > datetime.utcnow():
+        return JsonResponse(dict(
+            response_data,
+            next_poll_at=video_gen.next_poll_at.isoformat(),
+            message='Next status check not due yet'
+        ))
     
     try:
-        # Queue async status check task
-        # For real-time status, we can also check directly
-        # But for better scalability, we use the task
-        task = check_video_status_task.delay(str(video_id))
+        # Only the request that sets the marker queues a check, concurrent requests share it
+        refresh_interval = getattr(settings, 'VEO_STATUS_MIN_REFRESH_SECONDS', 10)
+        if not cache.add(f'veo_status_check:{video_id}', 1, timeout=refresh_interval):
+            return JsonResponse(dict(response_data, message='Status check already in progress'))
         
-        # Also try to get current status from database
+        # Queue async status check task
         # The task will update the status in the background
-        response_data = {
-            'status': video_gen.status,
-            'video_id': str(video_id),
-            'operation_name': operation_data.get('operation_name'),
-            'task_id': task.id,
-            'message': 'Status check queued'
-        }
-        
-        # If video is already completed, include video URL
-        if video_gen.status == 'completed' and video_gen.video_url:
-            response_data['video_url'] = video_gen.video_url
-        
-        # If video failed, include error message
-        if video_gen.status == 'failed' and video_gen.error_message:
-            response_data['error'] = video_gen.error_message
-        
-        return JsonResponse(response_data)
+        task = check_video_status_task.delay(str(video_id))
+        return JsonResponse(dict(response_data, task_id=task.id, message='Status check queued'))
     
     except Exception as e:
         logger.error(f"Error checking video status {video_id}: {str(e)}", exc_info=True)
+        cache.delete(f'veo_status_check:{video_id}')
         return JsonResponse({
             'error': str(e),
             'status': video_gen.status,
             'video_id': str(video_id)
         }, status=500)
+
+
+@require_http_methods(["GET"])
+def api_project_statuses(request, project_id):
+    """
+    API endpoint: Trả về status của các videos trong project đã thay đổi kể từ cursor `since`
+    
+    Query params:
+        since: Cursor (ISO timestamp) từ response trước, bỏ trống để lấy tất cả videos
+    """
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    
+    try:
+        project_object_id = ObjectId(project_id)
+    except (InvalidId, TypeError):
+        return JsonResponse({'error': 'Project not found'}, status=404)
+    
+    project = Project.objects(id=project_object_id).only('id', 'status').first()
+    if project is None:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+    
+    since = request.GET.get('since')
+    query = VideoGeneration.objects(project=project_object_id)
+    if since:
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid since cursor'}, status=400)
+        query = query(updated_at__gte=since_dt)
+    
+    # Writes that started before this query may land after it, so the next
+    # cursor overlaps a little; the client treats repeated rows as no-ops
+    next_cursor = datetime.utcnow() - timedelta(seconds=STATUS_CURSOR_OVERLAP_SECONDS)
+    
+    rows = query.order_by().only('id', 'status', 'video_url', 'video_file_path', 'error_message').as_pymongo()
+    videos = [
+        {
+            'video_id': str(row['_id']),
+            'status': row.get('status'),
+            'video_url': row.get('video_url'),
+            'file_url': reverse('serve_video', args=[str(row['_id'])]) if row.get('video_file_path') else None,
+            'error': row.get('error_message'),
+        }
+        for row in rows
+    ]
+    
+    return JsonResponse({
+        'project_id': project_id,
+        'project_status': project.status,
+        'videos': videos,
+        'cursor': next_cursor.isoformat(),
+        'retry_after': _status_retry_after(project_object_id)
+    })
+
+
+def _status_retry_after(project_object_id) -> int:
+    """
+    Seconds client nên đợi trước request status tiếp theo: đến khi Veo operation
+    sớm nhất của project đến hạn poll (cộng thời gian một beat sweep)
+    """
+    min_seconds = getattr(settings, 'STATUS_CLIENT_MIN_RETRY_SECONDS', 2)
+    max_seconds = getattr(settings, 'STATUS_CLIENT_MAX_RETRY_SECONDS', 30)
+    
+    next_due = (
+        VideoGeneration.objects(project=project_object_id, status='processing', next_poll_at__ne=None)
+        .order_by('next_poll_at').only('next_poll_at').as_pymongo().first()
+    )
+    if not next_due:
+        # Nothing submitted to Veo yet (pending rows are picked up within seconds)
+        return min(5, max_seconds)
+    
+    seconds = (next_due['next_poll_at'] - datetime.utcnow()).total_seconds()
+    seconds += getattr(settings, 'VEO_POLL_INTERVAL_SECONDS', 5)
+    return int(max(min_seconds, min(max_seconds, seconds)))
+
+
+@require_http_methods(["GET"])
+def api_project_progress(request, project_id):
+    """API endpoint: Số videos theo status của project từ Redis counters (O(1))"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    
+    try:
+        ObjectId(project_id)
+    except (InvalidId, TypeError):
+        return JsonResponse({'error': 'Project not found'}, status=404)
+    
+    return JsonResponse({
+        'project_id': project_id,
+        'counts': progress_service.get_progress(project_id)
+    })
+
+
+def _sse_message(event: str, data: dict) -> str:
+    """Format một Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@require_http_methods(["GET"])
+async def api_project_events(request, project_id):
+    """
+    API endpoint (SSE): Stream status transitions và aggregate counts của project
+    
+    Chỉ hoạt động khi chạy qua ASGI (agentvideo/asgi.py), dưới WSGI client sẽ fallback sang polling.
+    """
+    from asgiref.sync import sync_to_async
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    from django.core.handlers.asgi import ASGIRequest
+    
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event stream requires an ASGI server'}, status=501)
+    
+    try:
+        project_object_id = ObjectId(project_id)
+    except (InvalidId, TypeError):
+        return JsonResponse({'error': 'Project not found'}, status=404)
+    
+    exists = await sync_to_async(lambda: Project.objects(id=project_object_id).count() > 0)()
+    if not exists:
+        return JsonResponse({'error': 'Project not found'}, status=404)
+    
+    get_counts = sync_to_async(progress_service.get_progress)
+    counts_interval = getattr(settings, 'PROJECT_EVENTS_COUNTS_INTERVAL_SECONDS', 10)
+    
+    async def event_stream():
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+        yield _sse_message('counts', await get_counts(project_id))
+        last_counts = time.monotonic()
+        
+        async for event in progress_service.subscribe_project_events(project_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield _sse_message('status', event)
+            
+            if time.monotonic() - last_counts >= counts_interval:
+                yield _sse_message('counts', await get_counts(project_id))
+                last_counts = time.monotonic()
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+def _parse_byte_range(range_header: str, size: int):
+    """
+    Parse single `Range: bytes=...` header
+    
+    Returns:
+        Tuple (start, end) inclusive, None nếu header không hợp lệ / multi-range (trả về toàn bộ file)
+    
+    Raises:
+        ValueError: Nếu range không thỏa mãn được (416)
+    """
+    unit, _, ranges = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    
+    first, sep, last = ranges.strip().partition('-')
+    if not sep or not (first.isdigit() or last.isdigit()):
+        return None
+    if first and last and not (first.isdigit() and last.isdigit()):
+        return None
+    
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError('Range not satisfiable')
+        return max(size - suffix, 0), size - 1
+    
+    start = int(first)
+    end = int(last) if last else None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise ValueError('Range not satisfiable')
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def _if_range_matches(request, etag: str, last_modified: float) -> bool:
+    """Range chỉ được áp dụng khi If-Range (nếu có) khớp với version hiện tại của file"""
+    from django.utils.http import parse_http_date_safe
+    
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(last_modified) <= if_range_date
+
+
+def _iter_file_range(path: str, start: int, length: int, chunk_size: int = 64 * 1024):
+    """Đọc `length` bytes từ `start` theo từng chunk"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_video(request, video_id):
+    """
+    Serve local copy của generated video với HTTP Range (206), ETag và Last-Modified
+    
+    Khi VIDEO_SENDFILE_BACKEND được cấu hình, file được giao cho front proxy
+    (X-Sendfile / X-Accel-Redirect) thay vì stream qua Django worker.
+    """
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import FileResponse, Http404
+    from django.utils.cache import get_conditional_response
+    from django.utils.http import http_date
+    
+    try:
+        video_object_id = ObjectId(video_id)
+    except (InvalidId, TypeError):
+        raise Http404("Video not found")
+    
+    video = VideoGeneration.objects(id=video_object_id).only('video_file_path', 'video_checksum').first()
+    if video is None or not video.video_file_path:
+        raise Http404("Video not found")
+    
+    full_path = os.path.join(settings.MEDIA_ROOT, video.video_file_path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("Video file not found")
+    
+    size = stat.st_size
+    last_modified = stat.st_mtime
+    etag = f'"{video.video_checksum}"' if video.video_checksum else f'"{size:x}-{int(last_modified):x}"'
+    
+    def with_validators(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+    
+    # 304 Not Modified / 412 Precondition Failed
+    conditional_response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if conditional_response is not None:
+        return with_validators(conditional_response)
+    
+    # Offload to the front proxy, which also handles Range requests
+    sendfile_backend = getattr(settings, 'VIDEO_SENDFILE_BACKEND', '')
+    if sendfile_backend == 'x-accel-redirect':
+        response = HttpResponse(content_type='video/mp4')
+        prefix = getattr(settings, 'VIDEO_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + video.video_file_path.replace(os.sep, '/')
+        return with_validators(response)
+    if sendfile_backend == 'x-sendfile':
+        response = HttpResponse(content_type='video/mp4')
+        response['X-Sendfile'] = full_path
+        return with_validators(response)
+    
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = _parse_byte_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return with_validators(response)
+    
+    if byte_range is None and not isinstance(request, ASGIRequest):
+        # Whole file: FileResponse uses wsgi.file_wrapper (sendfile) when the server has one
+        return with_validators(FileResponse(open(full_path, 'rb'), content_type='video/mp4'))
+    
+    # Under ASGI the file is read chunk by chunk in a worker thread instead of into memory
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _streaming_content(request, _iter_file_range(full_path, start, length)),
+        status=200 if byte_range is None else 206,
+        content_type='video/mp4'
+    )
+    response['Content-Length'] = str(length)
+    if byte_range is not None:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return with_validators(response)
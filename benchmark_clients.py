@@ -0,0 +1,83 @@
+"""
+Benchmark Gemini/Veo client reuse
+Compares per-call latency of creating a new client for every call (old behaviour)
+with reusing the process-wide pooled client from app.services.
+
+Usage:
+    python benchmark_clients.py [--iterations 10] [--only gemini|veo]
+"""
+import os
+import time
+import argparse
+import statistics
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agentvideo.settings')
+
+import django
+
+django.setup()
+
+from app.services import gemini_service, veo_service
+
+VEO_MODEL = "veo-3.1-fast-generate-preview"
+
+
+def gemini_call():
+    """Cheap Gemini round trip: count tokens"""
+    gemini_service.get_gemini_client().count_tokens("benchmark")
+
+
+def veo_call():
+    """Cheap Veo round trip: fetch model metadata"""
+    veo_service.get_veo_client().models.get(model=VEO_MODEL)
+
+
+def measure(call, reset, iterations):
+    """Run `call` iterations times, calling `reset` before each call when given"""
+    timings = []
+    for _ in range(iterations):
+        if reset:
+            reset()
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name, fresh, pooled):
+    fresh_median = statistics.median(fresh)
+    pooled_median = statistics.median(pooled)
+    print(f"\n{name}")
+    print(f"  new client per call: median {fresh_median:8.1f} ms, mean {statistics.mean(fresh):8.1f} ms")
+    print(f"  pooled client:       median {pooled_median:8.1f} ms, mean {statistics.mean(pooled):8.1f} ms")
+    print(f"  saved per call:      {fresh_median - pooled_median:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--only', choices=['gemini', 'veo'])
+    args = parser.parse_args()
+
+    benchmarks = [
+        ('Gemini (count_tokens)', 'gemini', gemini_call, gemini_service.reset_client),
+        ('Veo (models.get)', 'veo', veo_call, veo_service.reset_client),
+    ]
+    for name, key, call, reset in benchmarks:
+        if args.only and args.only != key:
+            continue
+        try:
+            # Warm up once so DNS/imports don't skew the first sample
+            call()
+            fresh = measure(call, reset, args.iterations)
+            reset()
+            call()
+            pooled = measure(call, None, args.iterations)
+        except Exception as e:
+            print(f"\n{name}: skipped ({e})")
+            continue
+        report(name, fresh, pooled)
+
+
+if __name__ == '__main__':
+    main()